@@ -0,0 +1,178 @@
+# backend/analysis.py
+"""
+Extracted report text → structured analysis → insights.
+
+Pure functions of the text (and the rule registry), shared by the API
+(``main.py``) and the job workers (``job_worker.py``); importing this
+module opens no databases and starts no pools.
+"""
+from typing import Any, Dict, List
+
+import metrics
+from extractor import PATIENT_NAME_RE, DATE_FIELD_RES
+from parser import auto_rows, cbc_rows, table_rows
+from rules import BodyPart, registry
+
+def _layout_rows(rows):
+    """Rows already rebuilt from PDF word coordinates (see layout.py); no text scanning"""
+    for row in rows:
+        if row.ref_low is not None and row.ref_high is not None:
+            ref_range = f"{row.ref_low}-{row.ref_high}"
+        elif row.ref_high is not None:
+            ref_range = f"<{row.ref_high}"
+        elif row.ref_low is not None:
+            ref_range = f">{row.ref_low}"
+        else:
+            ref_range = ""
+        yield row.name, row.value, row.unit, row.ref_low, row.ref_high, ref_range
+
+# Selectable with ?parser= on /upload.  "layout" reads PDF rows from word
+# coordinates; its text fallback (images, streamed pages) is "auto".
+PARSERS = {"cbc": cbc_rows, "table": table_rows, "auto": auto_rows, "layout": auto_rows}
+
+def analyze_medical_report(text: str, parser: str = "cbc", rows=None) -> Dict[str, Any]:
+    """Analyze extracted medical report text and structure the data (``rows``: layout rows, if any)"""
+    analysis = {
+        "patient_info": {},
+        "test_results": [],
+        "summary": {},
+        "flags": [],
+        "body_analysis": {}
+    }
+    
+    # Extract patient information with more flexible patterns
+    patient_match = PATIENT_NAME_RE.search(text)
+    if patient_match:
+        analysis["patient_info"]["name"] = patient_match.group(1).strip()
+    
+    # Extract date from multiple possible fields
+    for date_re in DATE_FIELD_RES:
+        date_match = date_re.search(text)
+        if date_match:
+            analysis["patient_info"]["date"] = date_match.group(1).strip()
+            break
+    
+    # Abnormal-test count per affected body part, in order of first flag
+    # (so ties for most affected are stable)
+    rules = registry.rules
+    affected_body_parts: Dict[BodyPart, int] = {}
+    
+    found = _layout_rows(rows) if rows is not None else PARSERS[parser](text)
+    for test_name, value, unit, min_normal, max_normal, ref_range in found:
+        status = "Normal"
+        flag = ""
+        status_type = "normal"
+        
+        if min_normal is not None and value < min_normal:
+            status = "Low"
+            flag = "Below normal range"
+            status_type = "low"
+        elif max_normal is not None and value > max_normal:
+            status = "High"
+            flag = "Above normal range"
+            status_type = "high"
+        
+        body_part = rules.body_part(test_name)
+        test_result = {
+            "test": test_name,
+            "value": value,
+            "unit": unit,
+            "status": status,
+            "status_type": status_type,
+            "normal_range": ref_range,
+            "flag": flag,
+            "flag_message": flag,
+            "body_part": body_part.value
+        }
+        
+        analysis["test_results"].append(test_result)
+        
+        if flag:
+            analysis["flags"].append({
+                "test": test_name,
+                "message": flag,
+                "severity": "warning" if status_type in ["low", "high"] else "info",
+                "body_part": body_part.value
+            })
+            affected_body_parts[body_part] = affected_body_parts.get(body_part, 0) + 1
+    
+    # Generate body analysis
+    analysis["body_analysis"] = {
+        "affected_parts": [part.value for part in affected_body_parts],
+        "most_affected_part": max(
+            affected_body_parts, key=affected_body_parts.get
+        ).value if affected_body_parts else "None",
+        "full_body_affected": BodyPart.FULL_BODY in affected_body_parts
+    }
+    
+    # Generate summary
+    total_tests = len(analysis["test_results"])
+    abnormal_tests = len([t for t in analysis["test_results"] if t["status"] != "Normal"])
+    
+    analysis["summary"] = {
+        "total_tests": total_tests,
+        "normal_tests": total_tests - abnormal_tests,
+        "abnormal_tests": abnormal_tests,
+        "overall_status": "Normal" if abnormal_tests == 0 else "Attention Required",
+        "severity": "normal" if abnormal_tests == 0 else "warning",
+        "body_impact": analysis["body_analysis"]
+    }
+    
+    return analysis
+
+def generate_medical_insights(analysis: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Generate medical insights based on the analysis"""
+    insights = []
+    
+    rules = registry.rules
+    
+    for test in analysis["test_results"]:
+        insight = rules.insights.get((test["test"], test["status"]))
+        if insight:
+            insights.append({
+                "message": insight.message,
+                "severity": insight.severity,
+                "test": test["test"],
+                "body_part": test["body_part"]
+            })
+    
+    # Add body-specific insights
+    if analysis["body_analysis"]["affected_parts"]:
+        most_affected = analysis["body_analysis"]["most_affected_part"]
+        
+        if most_affected != "None":
+            insights.append({
+                "message": f"Most affected system: {most_affected}. Pay special attention to this area.",
+                "severity": "info",
+                "test": "Body Analysis",
+                "body_part": most_affected
+            })
+    
+    if not insights:
+        insights.append({
+            "message": "All test results appear within normal ranges. Maintain current health practices.",
+            "severity": "success",
+            "test": "Overall",
+            "body_part": "Full Body"
+        })
+    
+    return insights
+
+def report_from_text(text: str, parser: str = "cbc", rows=None) -> Dict[str, Any]:
+    """Analysis and insights for extracted text (shared with job_worker.py)"""
+    if not text.strip():
+        return {"error": "No text could be extracted from the file"}
+    
+    # Analyze the medical report
+    with metrics.span("analysis"):
+        analysis = analyze_medical_report(text, parser, rows)
+    
+    # Generate insights
+    with metrics.span("insights"):
+        insights = generate_medical_insights(analysis)
+    
+    return {
+        "extracted_text": text,
+        "analysis": analysis,
+        "insights": insights,
+    }
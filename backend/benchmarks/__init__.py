@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+
+def isolate() -> None:
+    """
+    Keep a benchmark run in-process, uncached and free of side effects.
+    Settings are read at import, so call this before importing anything
+    from the app.
+    """
+    os.environ.update({
+        "HEALTHSCAN_OCR_WORKERS": "0",
+        "HEALTHSCAN_OCR_WARMUP": "0",
+        "HEALTHSCAN_CACHE_MAX_ENTRIES": "0",
+        "HEALTHSCAN_CACHE_DB": "",
+        "HEALTHSCAN_HISTORY_DB": "",
+        "HEALTHSCAN_JOBS_DB": os.path.join(tempfile.gettempdir(), "healthscan-bench-jobs.db"),
+    })
@@ -0,0 +1,94 @@
+# backend/benchmarks/analysis_scaling.py
+"""
+Scaling benchmark for test extraction.
+
+Compares the old per-pattern ``re.search`` loop against the precompiled
+``extractor.TestExtractor`` on synthetic reports of growing size.  Run from
+``backend/``:
+
+    python -m benchmarks.analysis_scaling
+"""
+import random
+import re
+import time
+
+from extractor import TEST_PATTERNS, extractor
+
+ROW_TEMPLATES = [
+    "Hemoglobin {v} g/dL 13.0 - 17.0",
+    "RBC Count {v} 10^6/μl 4.5 - 5.5",
+    "PCV {v} % 40 - 50",
+    "MCV {v} fl 83 - 101",
+    "MCH {v} pg 27 - 32",
+    "MCHC {v} g/dL 31.5 - 34.5",
+    "Neutrophils {v} % 40 - 80",
+    "Lymphocytes {v} % 20 - 40",
+    "Platelet Count {v} 10^3/μl 150 - 410",
+]
+FILLER = [
+    "This report is electronically verified and does not require a signature.",
+    "Results relate only to the sample tested. Please correlate clinically.",
+    "Method: automated hematology analyser, flow cytometry / impedance.",
+]
+
+
+def synthetic_report(n_lines: int, row_rate: float = 0.3, seed: int = 0) -> str:
+    """
+    ``n_lines`` of report body; each line is a result row with probability
+    ``row_rate``, otherwise boilerplate.  Rows are placed after the filler
+    when ``row_rate`` is 0 so the few tests present sit at the very end —
+    the worst case for per-pattern searching.
+    """
+    rng = random.Random(seed)
+    lines = ["Patient Name : Test Patient", "Report Date : 01/01/2024"]
+    for _ in range(n_lines):
+        if rng.random() < row_rate:
+            lines.append(rng.choice(ROW_TEMPLATES).format(v=round(rng.uniform(1, 200), 1)))
+        else:
+            lines.append(rng.choice(FILLER))
+    if not row_rate:
+        lines.extend(t.format(v=12.5) for t in ROW_TEMPLATES[:3])
+    return "\n".join(lines)
+
+
+def legacy_find(text: str):
+    found = []
+    for pattern, *_ in TEST_PATTERNS:
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            found.append(match)
+    return found
+
+
+def compiled_find(text: str):
+    return extractor.find(text)
+
+
+def _time(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes=(100, 1_000, 10_000, 50_000), repeat: int = 5) -> None:
+    for label, row_rate in (("dense (30% result rows)", 0.3), ("sparse (tests at the end)", 0.0)):
+        print(f"\n{label}")
+        _run(sizes, row_rate, repeat)
+
+
+def _run(sizes, row_rate: float, repeat: int) -> None:
+    print(f"{'lines':>8} {'KB':>8} {'legacy ms':>10} {'compiled ms':>12} {'µs/KB':>8} {'speedup':>8}")
+    for n_lines in sizes:
+        text = synthetic_report(n_lines, row_rate)
+        kb = len(text.encode()) / 1024
+        legacy = _time(legacy_find, text, repeat)
+        compiled = _time(compiled_find, text, repeat)
+        print(f"{n_lines:>8} {kb:>8.1f} {legacy * 1e3:>10.2f} {compiled * 1e3:>12.2f} "
+              f"{compiled * 1e6 / kb:>8.1f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
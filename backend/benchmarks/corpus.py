@@ -0,0 +1,147 @@
+# backend/benchmarks/corpus.py
+"""
+Deterministic synthetic lab reports for the benchmarks.
+
+Every report is generated from a seed, so two runs (or two machines) see
+byte-identical inputs.  The same report body is available as
+
+* plain text                        (``report_text``)
+* a PDF with selectable text        (``text_pdf``)
+* a PDF of rasterised page scans    (``scanned_pdf``)
+* a PDF mixing both, page by page   (``mixed_pdf``)
+* a single scanned page as PNG      (``scan_image``)
+
+``corpus`` builds a grid of these over page count and tests per page.
+"""
+import io
+import random
+from typing import Iterator, List, NamedTuple, Sequence
+
+import fitz
+from PIL import Image
+
+from extractor import TEST_PATTERNS
+from rules import registry
+
+# PDF base fonts have no "μ"; lab printouts often write "u" anyway.
+_ROWS = [(name, unit.replace("μ", "u"), *registry.rules.ranges[name]) for _, name, unit in TEST_PATTERNS]
+FILLER = [
+    "Results relate only to the sample tested. Please correlate clinically.",
+    "Method: automated hematology analyser, flow cytometry / impedance.",
+    "This report is electronically verified and does not require a signature.",
+]
+SCAN_DPI = 150          # what a typical office scanner produces
+PAGE_LINES = 48         # lines that fit on one A4 page at 10pt
+
+
+class Sample(NamedTuple):
+    kind: str           # text | text_pdf | scanned_pdf | mixed_pdf | image
+    pages: int
+    tests: int          # result rows per page
+    filename: str
+    payload: bytes
+    text: str           # the report body the payload was made from
+
+
+def report_pages(pages: int, tests: int, seed: int = 0) -> List[str]:
+    """Text of each page: a header, ``tests`` result rows and filler."""
+    rng = random.Random(seed)
+    out = []
+    for page in range(pages):
+        lines = [
+            "Patient Name : Test Patient",
+            "Report Date : 01/01/2024",
+            f"Page {page + 1} of {pages}",
+            "",
+        ]
+        for name, unit, lo, hi in rng.sample(_ROWS, min(tests, len(_ROWS))):
+            # ranges are widened by 30% either side, so many values are abnormal
+            value = round(rng.uniform(lo * 0.7, hi * 1.3), 2)
+            lines.append(f"{name}  {value}  {unit}  {lo} - {hi}")
+        while len(lines) < PAGE_LINES:
+            lines.append(rng.choice(FILLER))
+        out.append("\n".join(lines))
+    return out
+
+
+def report_text(pages: int, tests: int, seed: int = 0) -> str:
+    return "\n".join(report_pages(pages, tests, seed))
+
+
+def _add_text_page(doc: "fitz.Document", text: str) -> None:
+    page = doc.new_page(width=595, height=842)          # A4 in points
+    page.insert_text((48, 60), text, fontsize=10, fontname="helv")
+
+
+def _scan_png(text: str, seed: int, dpi: int = SCAN_DPI, skew: float = 0.0, fmt: str = "png") -> bytes:
+    """
+    Render a page of text and degrade it slightly, like a scanner would:
+    speckle, and optionally a skew of ``skew`` degrees.
+    """
+    with fitz.open() as doc:
+        _add_text_page(doc, text)
+        pix = doc[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    samples = bytearray(pix.samples)
+    rng = random.Random(seed)
+    for _ in range(len(samples) // 200):                # ~0.5% speckle
+        samples[rng.randrange(len(samples))] = rng.randrange(256)
+    img = Image.frombytes("L", (pix.width, pix.height), bytes(samples))
+    if skew:
+        img = img.rotate(skew, resample=Image.BILINEAR, fillcolor=255, expand=True)
+    out = io.BytesIO()
+    img.save(out, format=fmt)
+    return out.getvalue()
+
+
+def _add_scanned_page(doc: "fitz.Document", text: str, seed: int, dpi: int = SCAN_DPI) -> None:
+    page = doc.new_page(width=595, height=842)
+    page.insert_image(page.rect, stream=_scan_png(text, seed, dpi))
+
+
+def text_pdf(pages: int, tests: int, seed: int = 0) -> bytes:
+    with fitz.open() as doc:
+        for text in report_pages(pages, tests, seed):
+            _add_text_page(doc, text)
+        return doc.tobytes()
+
+
+def scanned_pdf(pages: int, tests: int, seed: int = 0, dpi: int = SCAN_DPI) -> bytes:
+    with fitz.open() as doc:
+        for i, text in enumerate(report_pages(pages, tests, seed)):
+            _add_scanned_page(doc, text, seed + i, dpi)
+        return doc.tobytes()
+
+
+def mixed_pdf(pages: int, tests: int, seed: int = 0) -> bytes:
+    """Odd pages selectable, even pages scanned."""
+    with fitz.open() as doc:
+        for i, text in enumerate(report_pages(pages, tests, seed)):
+            if i % 2:
+                _add_scanned_page(doc, text, seed + i)
+            else:
+                _add_text_page(doc, text)
+        return doc.tobytes()
+
+
+def scan_image(tests: int, seed: int = 0, dpi: int = SCAN_DPI, skew: float = 0.0, fmt: str = "png") -> bytes:
+    return _scan_png(report_pages(1, tests, seed)[0], seed, dpi, skew, fmt)
+
+
+KINDS = ("text", "text_pdf", "scanned_pdf", "mixed_pdf", "image")
+
+
+def corpus(kinds: Sequence[str] = KINDS, page_counts: Sequence[int] = (1, 4, 12),
+           test_counts: Sequence[int] = (5, 25), seed: int = 0) -> Iterator[Sample]:
+    """Every kind × page count × tests-per-page combination (images are single page)."""
+    for kind in kinds:
+        for pages in (1,) if kind == "image" else page_counts:
+            for tests in test_counts:
+                text = report_text(pages, tests, seed)
+                if kind == "text":
+                    payload, filename = text.encode(), "report.txt"
+                elif kind == "image":
+                    payload, filename = scan_image(tests, seed), "report.png"
+                else:
+                    build = {"text_pdf": text_pdf, "scanned_pdf": scanned_pdf, "mixed_pdf": mixed_pdf}[kind]
+                    payload, filename = build(pages, tests, seed), "report.pdf"
+                yield Sample(kind, pages, tests, filename, payload, text)
@@ -0,0 +1,97 @@
+# backend/benchmarks/harness.py
+"""
+Timing and memory measurement shared by the benchmarks.
+
+``measure`` calls a function over a list of inputs and reports throughput,
+latency percentiles and peak memory.  Latencies come from a plain timed pass.
+Peak memory is taken in a second, untimed pass under ``tracemalloc``, so the
+tracing overhead does not show up in the latencies.  ``tracemalloc`` sees
+Python objects and NumPy buffers, but not MuPDF's own C heap.
+"""
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+
+class Result(NamedTuple):
+    name: str
+    case: str
+    calls: int
+    per_second: float       # calls per second over the timed pass
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_kib: float         # largest tracemalloc peak of any single call
+
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+def measure(name: str, case: str, fn: Callable[[Any], Any], inputs: Sequence[Any],
+            repeat: int = 5, warmup: int = 1) -> Result:
+    for item in inputs[:warmup]:
+        fn(item)
+
+    latencies: List[float] = []
+    gc.collect()
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start)
+
+    peak = 0
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fn(item)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    ms = np.asarray(latencies) * 1e3
+    return Result(
+        name=name,
+        case=case,
+        calls=len(latencies),
+        per_second=len(latencies) / (ms.sum() / 1e3),
+        p50_ms=float(np.percentile(ms, 50)),
+        p90_ms=float(np.percentile(ms, 90)),
+        p99_ms=float(np.percentile(ms, 99)),
+        max_ms=float(ms.max()),
+        peak_kib=peak / 1024,
+    )
+
+
+HEADER = f"{'function':<28} {'case':<22} {'calls':>6} {'per s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KiB':>10}"
+
+
+def row(r: Result) -> str:
+    return (f"{r.name:<28} {r.case:<22} {r.calls:>6} {r.per_second:>9.1f} {r.p50_ms:>9.2f} "
+            f"{r.p90_ms:>9.2f} {r.p99_ms:>9.2f} {r.peak_kib:>10.0f}")
+
+
+def compare(current: Sequence[Result], baseline: Sequence[Dict[str, Any]]) -> List[str]:
+    """p50 / throughput / peak-memory change against a previous ``--json`` run."""
+    old = {(b["name"], b["case"]): b for b in baseline}
+    lines = [f"{'function':<28} {'case':<22} {'p50':>9} {'per s':>9} {'peak':>9}"]
+    for r in current:
+        b = old.get((r.name, r.case))
+        if b is None:
+            lines.append(f"{r.name:<28} {r.case:<22} {'new':>9}")
+            continue
+        lines.append(
+            f"{r.name:<28} {r.case:<22} {_change(r.p50_ms, b['p50_ms']):>9} "
+            f"{_change(r.per_second, b['per_second']):>9} {_change(r.peak_kib, b['peak_kib']):>9}"
+        )
+    return lines
+
+
+def _change(new: float, old: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
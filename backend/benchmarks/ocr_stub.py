@@ -0,0 +1,54 @@
+# backend/benchmarks/ocr_stub.py
+"""
+Deterministic stand-in for the OCR backends, so the benchmarks run offline
+and their numbers do not depend on model weights or a GPU.
+
+``install()`` makes a ``StubReader`` the only backend behind
+``ocr.get_reader``.  The stub still decodes its input, as EasyOCR does, and
+then returns a fixed page of report text.  It can optionally sleep a fixed time per
+megapixel, to model OCR cost in proportion to the raster size.
+"""
+import io
+import time
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.corpus import report_pages
+from ocr_backends import Reading, StubBackend, TieredReader
+
+
+class StubReader(StubBackend):
+    def __init__(self, lines: Optional[List[str]] = None, seconds_per_megapixel: float = 0.0):
+        super().__init__(lines if lines is not None else report_pages(1, 15, seed=1)[0].split("\n"))
+        self.seconds_per_megapixel = seconds_per_megapixel
+        self.calls = 0
+        self.pixels = 0
+
+    def read(self, image) -> Reading:
+        pixels = _decode(image)
+        self.calls += 1
+        self.pixels += pixels.size
+        if self.seconds_per_megapixel:
+            time.sleep(pixels.size / 1e6 * self.seconds_per_megapixel)
+        return super().read(pixels)
+
+
+def _decode(image) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, bytes):
+        image = io.BytesIO(image)
+    with Image.open(image) as img:
+        return np.asarray(img.convert("L"))
+
+
+def install(reader: Optional[StubReader] = None) -> StubReader:
+    """Make ``ocr`` use ``reader`` (a fresh ``StubReader`` by default) in this process."""
+    import ocr
+
+    reader = reader or StubReader()
+    ocr._reader = TieredReader([reader])
+    ocr._model_state = "ready"
+    return reader
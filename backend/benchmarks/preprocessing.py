@@ -0,0 +1,119 @@
+# backend/benchmarks/preprocessing.py
+"""
+Fixture check for ``preprocess``: OCR input size and time with and without
+preprocessing, and whether the extracted test values survive it.
+
+Fixtures are synthetic scans from ``corpus.py``: office scans at several
+resolutions, skewed scans, a 600 dpi phone-style JPEG, a low-resolution crop
+and scanned PDF pages.  Run from ``backend/``:
+
+    python -m benchmarks.preprocessing          # pixels + preprocessing time (stub OCR)
+    python -m benchmarks.preprocessing --ocr    # also real OCR: seconds and values
+
+With ``--ocr`` the exit status is 1 when preprocessing loses a test value
+that plain OCR found on any fixture.
+"""
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+import fitz
+import numpy as np
+
+from benchmarks import isolate
+
+isolate()
+
+import ocr                                                        # noqa: E402
+import preprocess                                                 # noqa: E402
+from benchmarks import ocr_stub                                   # noqa: E402
+from benchmarks.corpus import report_pages, scan_image, scanned_pdf   # noqa: E402
+from analysis import analyze_medical_report                       # noqa: E402
+
+
+class Fixture(NamedTuple):
+    name: str
+    baseline: Callable[[], np.ndarray]      # what OCR saw before preprocessing
+    prepared: Callable[[], np.ndarray]
+    text: str                               # report text the fixture was made from
+
+
+def _image(name: str, raw: bytes, text: str) -> Fixture:
+    def baseline():
+        return ocr_stub._decode(raw)
+    return Fixture(name, baseline, lambda: preprocess.image_pixels(raw), text)
+
+
+def _pdf_page(name: str, raw: bytes, text: str) -> Fixture:
+    def render(fn):
+        def run():
+            with fitz.open(stream=raw, filetype="pdf") as doc:
+                return fn(doc[0])
+        return run
+    return Fixture(
+        name,
+        render(lambda page: preprocess.render_gray(page, ocr.SCAN_DPI)),
+        render(lambda page: preprocess.page_pixels(page, ocr.SCAN_DPI)),
+        text,
+    )
+
+
+def fixtures(tests: int = 20, seed: int = 0) -> List[Fixture]:
+    text = report_pages(1, tests, seed)[0]
+    return [
+        _image("scan 150 dpi", scan_image(tests, seed, dpi=150), text),
+        _image("scan 300 dpi", scan_image(tests, seed, dpi=300), text),
+        _image("scan 300 dpi, 2° skew", scan_image(tests, seed, dpi=300, skew=2), text),
+        _image("scan 200 dpi, -3.5° skew", scan_image(tests, seed, dpi=200, skew=-3.5), text),
+        _image("photo 600 dpi jpeg", scan_image(tests, seed, dpi=600, fmt="jpeg"), text),
+        _image("crop 100 dpi", scan_image(tests, seed, dpi=100), text),
+        _pdf_page("pdf scan 150 dpi", scanned_pdf(1, tests, seed, dpi=150), text),
+        _pdf_page("pdf scan 300 dpi", scanned_pdf(1, tests, seed, dpi=300), text),
+    ]
+
+
+def _values(text: str) -> Dict[str, float]:
+    return {t["test"]: t["value"] for t in analyze_medical_report(text)["test_results"]}
+
+
+def _ocr(pixels: np.ndarray) -> Tuple[str, float]:
+    start = time.perf_counter()
+    text = ocr.get_reader().read(pixels).text
+    return text, time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check OCR preprocessing against fixtures")
+    parser.add_argument("--ocr", action="store_true", help="run the configured OCR backends")
+    args = parser.parse_args()
+    if not args.ocr:
+        ocr_stub.install()
+
+    failed = False
+    print(f"{'fixture':<26} {'MP before':>9} {'MP after':>9} {'prep ms':>8}"
+          + (f" {'ocr s before':>12} {'ocr s after':>11} {'values before':>13} {'values after':>12}" if args.ocr else ""))
+    for fx in fixtures():
+        before = fx.baseline()
+        start = time.perf_counter()
+        after = fx.prepared()
+        prep = time.perf_counter() - start
+        line = f"{fx.name:<26} {before.size / 1e6:>9.2f} {after.size / 1e6:>9.2f} {prep * 1e3:>8.0f}"
+        if args.ocr:
+            expected = _values(fx.text)
+            text_before, secs_before = _ocr(before)
+            text_after, secs_after = _ocr(after)
+            got_before = {k: v for k, v in _values(text_before).items() if expected.get(k) == v}
+            got_after = {k: v for k, v in _values(text_after).items() if expected.get(k) == v}
+            lost = set(got_before) - set(got_after)
+            failed |= bool(lost)
+            line += (f" {secs_before:>12.2f} {secs_after:>11.2f} "
+                     f"{len(got_before):>6}/{len(expected):<6} {len(got_after):>5}/{len(expected):<6}")
+            if lost:
+                line += f"  lost: {', '.join(sorted(lost))}"
+        print(line)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
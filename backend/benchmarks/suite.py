@@ -0,0 +1,135 @@
+# backend/benchmarks/suite.py
+"""
+End-to-end benchmark suite over the synthetic corpus (see ``corpus.py``).
+
+Measures throughput, latency percentiles and peak memory per corpus case for
+the PDF/image extraction paths (and layout row extraction), the analysis step, the insights step and the whole
+``POST /upload`` path.  OCR is replaced by the deterministic stub in
+``ocr_stub.py``, so the suite needs no model and no network.  Run from
+``backend/``:
+
+    python -m benchmarks.suite                        # full grid
+    python -m benchmarks.suite --quick                # smaller grid, fewer repeats
+    python -m benchmarks.suite --json base.json       # keep the numbers
+    python -m benchmarks.suite --baseline base.json   # compare with a kept run
+
+``--ocr-ms-per-mpx`` makes the stub sleep per megapixel, to model real OCR
+cost on the scanned paths.
+"""
+import argparse
+import contextlib
+import io
+import json
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from benchmarks import isolate
+
+isolate()
+
+from benchmarks import ocr_stub                                   # noqa: E402
+from benchmarks.corpus import KINDS, Sample, corpus               # noqa: E402
+from benchmarks.harness import HEADER, Result, compare, measure, row   # noqa: E402
+
+Case = Tuple[str, int, int]     # (kind, pages, tests per page)
+
+
+def _quiet(fn):
+    """Drop the extractors' console previews while measuring."""
+    def call(*args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args)
+    return call
+
+
+def _label(case: Case) -> str:
+    kind, pages, tests = case
+    return f"{kind} {pages}p×{tests}t"
+
+
+def build_corpus(page_counts, test_counts, seeds: int) -> Dict[Case, List[Sample]]:
+    cases: Dict[Case, List[Sample]] = defaultdict(list)
+    for seed in range(seeds):
+        for sample in corpus(KINDS, page_counts, test_counts, seed):
+            cases[(sample.kind, sample.pages, sample.tests)].append(sample)
+    return cases
+
+
+def run(page_counts=(1, 4, 12), test_counts=(5, 25), seeds: int = 3, repeat: int = 5,
+        ocr_ms_per_mpx: float = 0.0) -> List[Result]:
+    import ocr
+    from fastapi.testclient import TestClient
+    from analysis import analyze_medical_report, generate_medical_insights
+    from main import app
+
+    ocr_stub.install(ocr_stub.StubReader(seconds_per_megapixel=ocr_ms_per_mpx / 1e3))
+    cases = build_corpus(page_counts, test_counts, seeds)
+    client = TestClient(app)
+
+    def upload(sample: Sample):
+        response = client.post("/upload", files={"file": (sample.filename, sample.payload)})
+        body = response.json()
+        if response.status_code != 200 or "error" in body:
+            raise RuntimeError(f"/upload failed for {sample.filename}: {response.status_code} {body}")
+
+    def all_pages(raw: bytes):
+        # every page, as /upload?parser=table would: no early stop, no budget
+        return ocr._extract_pdf(raw).text
+
+    def layout_rows(raw: bytes):
+        return ocr._extract_pdf(raw, with_layout=True).rows
+
+    extractors = {
+        "text_pdf": ("_extract_pdf", all_pages),
+        "mixed_pdf": ("_extract_pdf", all_pages),
+        "scanned_pdf": ("_extract_pdf", all_pages),
+        "image": ("_text_from_image", ocr._text_from_image),
+    }
+
+    results = []
+    for case, samples in cases.items():
+        kind, label = case[0], _label(case)
+        payloads = [s.payload for s in samples]
+        if kind == "text":
+            texts = [s.text for s in samples]
+            analyses = [analyze_medical_report(t) for t in texts]
+            results.append(measure("analyze_medical_report", label, analyze_medical_report, texts, repeat))
+            results.append(measure("generate_medical_insights", label, generate_medical_insights, analyses, repeat))
+            continue
+        name, fn = extractors[kind]
+        results.append(measure(name, label, _quiet(fn), payloads, repeat))
+        if kind == "text_pdf":
+            results.append(measure("_extract_pdf with_layout", label, _quiet(layout_rows), payloads, repeat))
+        results.append(measure("POST /upload", label, _quiet(upload), samples, repeat))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HealthScan benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="small grid, two repeats")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written by --json")
+    parser.add_argument("--ocr-ms-per-mpx", type=float, default=0.0,
+                        help="simulated OCR cost of the stub, in ms per megapixel")
+    args = parser.parse_args()
+
+    if args.quick:
+        results = run((1, 4), (5, 25), seeds=2, repeat=2, ocr_ms_per_mpx=args.ocr_ms_per_mpx)
+    else:
+        results = run(ocr_ms_per_mpx=args.ocr_ms_per_mpx)
+
+    print(HEADER)
+    for r in results:
+        print(row(r))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([r.as_dict() for r in results], f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print("\nchange against", args.baseline)
+        print("\n".join(compare(results, baseline)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# backend/cache.py
+"""
+Content-addressed cache for upload results.
+
+Results are keyed by a SHA-256 of the uploaded bytes (plus the extension,
+since that decides which extractor runs).  Lookups go through an in-memory
+LRU first and then an optional SQLite file; both tiers evict by TTL and by
+total size.  ``SingleFlight`` coalesces concurrent identical uploads so only
+one extraction runs while the others await its result.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+import settings
+
+
+def content_key(filename: str, raw: bytes) -> str:
+    """Cache key for an upload: extension + SHA-256 of its bytes."""
+    return digest_key(filename, hashlib.sha256(raw).hexdigest())
+
+
+def digest_key(filename: str, sha256: str) -> str:
+    """Cache key for an upload whose SHA-256 is already known (spooled uploads)."""
+    return f"{Path(filename).suffix.lower()}:{sha256}"
+
+
+class MemoryTier:
+    """Thread-safe LRU bounded by entry count, total payload size and TTL."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()   # key → (expires, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, size, value = item
+            if expires < time.monotonic():
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Dict[str, Any], size: int) -> None:
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._items) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._items)))
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._items.pop(key)
+        self._bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class SQLiteTier:
+    """
+    On-disk tier; survives restarts and is shared by workers on one host.
+
+    The stored size is tracked as a running total, so a put costs one
+    insert.  Other processes' writes are not seen in it: only when it
+    passes the cap is the table summed again before anything is evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+        self._bytes = self._total()
+
+    def _total(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] + self.ttl < now:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key: str, payload: str) -> None:
+        now = time.time()
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+        total = self._bytes = self._total()
+        if total <= self.max_bytes:
+            return
+        # Least-recently-used first until we are back under the cap.
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM results ORDER BY accessed"
+        ).fetchall():
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._bytes = total
+
+
+class ResultCache:
+    """Two-tier cache of JSON-serialisable result dicts.
+
+    Returned dicts are shared between requests — treat them as read-only.
+    """
+
+    def __init__(self, memory: MemoryTier, disk: Optional[SQLiteTier] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        payload = self.disk.get(key)
+        if payload is None:
+            return None
+        value = json.loads(payload)
+        self.memory.put(key, value, len(payload))
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        payload = json.dumps(value)
+        self.memory.put(key, value, len(payload))
+        if self.disk is not None:
+            self.disk.put(key, payload)
+
+    # For the event loop: a memory hit is answered inline; the JSON encoding
+    # and the SQLite tier run in the thread pool.
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        return await run_in_threadpool(self.get, key)
+
+    async def aput(self, key: str, value: Dict[str, Any]) -> None:
+        await run_in_threadpool(self.put, key, value)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key onto one in-flight task.
+
+    A caller that is cancelled (its client went away) while doing the work
+    cancels only itself: a waiter takes over and runs ``fn`` again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise       # we were cancelled ourselves, not the caller doing the work
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a failure nobody else awaited is not logged.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+
+def build_cache() -> ResultCache:
+    memory = MemoryTier(
+        settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES, settings.CACHE_TTL_SECONDS
+    )
+    disk = None
+    if settings.CACHE_DB_PATH:
+        disk = SQLiteTier(
+            settings.CACHE_DB_PATH, settings.CACHE_DB_MAX_BYTES, settings.CACHE_TTL_SECONDS
+        )
+    return ResultCache(memory, disk)
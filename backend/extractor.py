@@ -0,0 +1,173 @@
+# backend/extractor.py
+"""
+Compiled test-extraction engine used by ``analyze_medical_report``.
+
+Every pattern is compiled once at import.  Instead of running ``re.search``
+for each of the ~25 patterns over the whole report, the text is scanned once
+for the keyword that every pattern starts with; the full pattern is then only
+tried *anchored* at those keyword positions.  The first anchored hit is the
+same match ``re.search`` would have returned, so results are unchanged.
+"""
+import re
+from typing import Dict, FrozenSet, Iterator, List, Mapping, Optional, Set, Tuple
+
+# (pattern, test name, unit); reference ranges are in rules.json ("ranges")
+TEST_PATTERNS = [
+    # RBC Parameters
+    (r"Hemoglobin\s*[^0-9]*([0-9.]+)\s*g/dL\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Hemoglobin", "g/dL"),
+    (r"RBC\s*(?:Count)?\s*[^0-9]*([0-9.]+)\s*10\^?[6]?/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "RBC Count", "10^6/μl"),
+    (r"PCV\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "PCV", "%"),
+    (r"MCV\s*[^0-9]*([0-9.]+)\s*f?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "MCV", "fl"),
+    (r"MCH\s*[^0-9]*([0-9.]+)\s*pg?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "MCH", "pg"),
+    (r"MCHC\s*[^0-9]*([0-9.]+)\s*g/dL\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "MCHC", "g/dL"),
+    (r"RDW\s*\(?CV\)?\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "RDW (CV)", "%"),
+    (r"RDW-SD\s*[^0-9]*([0-9.]+)\s*f?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "RDW-SD", "fl"),
+
+    # WBC Parameters
+    (r"TLC\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "TLC", "10^3/μl"),
+    (r"Neutrophils\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Neutrophils", "%"),
+    (r"Lymphocytes\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Lymphocytes", "%"),
+    (r"Monocytes\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Monocytes", "%"),
+    (r"Eosinophils\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Eosinophils", "%"),
+    (r"Basophils\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*<\s*([0-9.]+))?", "Basophils", "%"),
+
+    # Absolute Counts
+    (r"Neutrophils\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Neutrophils Absolute", "10^3/μl"),
+    (r"Lymphocytes\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Lymphocytes Absolute", "10^3/μl"),
+    (r"Monocytes\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Monocytes Absolute", "10^3/μl"),
+    (r"Eosinophils\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Eosinophils Absolute", "10^3/μl"),
+    (r"Basophils\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Basophils Absolute", "10^3/μl"),
+
+    # Platelets
+    (r"Platelet\s*(?:Count)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Platelet Count", "10^3/μl"),
+
+    # Other common tests
+    (r"WBC\s*[^0-9]*([0-9.]+)\s*10\^?3/?u?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "WBC", "10^3/μl"),
+    (r"Platelets\s*[^0-9]*([0-9.]+)\s*10\^?3?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Platelets", "10^3/μl"),
+    (r"ALT\s*[^0-9]*([0-9.]+)\s*U/?L?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "ALT", "U/L"),
+    (r"AST\s*[^0-9]*([0-9.]+)\s*U/?L?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "AST", "U/L"),
+    (r"Glucose\s*[^0-9]*([0-9.]+)\s*mg/?dL?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Glucose", "mg/dL"),
+]
+
+PATIENT_NAME_RE = re.compile(r"Patient\s*(?:NAME|Name)\s*:\s*([^\n]+)", re.IGNORECASE)
+DATE_FIELD_RES = [
+    re.compile(fr"{field}\s*:\s*([^\n,]+)", re.IGNORECASE)
+    for field in ("Sample Collected", "Report Date", "Date")
+]
+
+_KEYWORD_RE = re.compile(r"[A-Za-z][A-Za-z-]*")
+# Characters re.IGNORECASE matches against ASCII letters but str.lower() does
+# not map onto them (İ also changes length, which is checked separately).
+_FOLD_ONLY_RE = re.compile("[ıſ]")
+_FOLD_TABLE = str.maketrans("ıſİ", "isi")
+
+
+class TestExtractor:
+    """Precompiled, keyword-indexed matcher over a list of test patterns."""
+
+    def __init__(self, patterns: List[Tuple]):
+        self.specs = []
+        keywords = []
+        for pattern, test_name, unit in patterns:
+            keyword = _KEYWORD_RE.match(pattern).group(0).lower()
+            self.specs.append((re.compile(pattern, re.IGNORECASE), test_name, unit))
+            keywords.append(keyword)
+
+        # Collapse keywords sharing a prefix (MCH/MCHC, RDW/RDW-SD,
+        # Platelet/Platelets) onto the shortest one so a single position
+        # never has two candidate roots.
+        roots = []
+        for keyword in sorted(set(keywords), key=len):
+            if not any(keyword.startswith(root) for root in roots):
+                roots.append(keyword)
+        self._spec_root = [
+            next(root for root in roots if keyword.startswith(root))
+            for keyword in keywords
+        ]
+        alternation = "|".join(re.escape(root) for root in roots)
+        self._root_re = re.compile(alternation)
+        self._root_re_ci = re.compile(alternation, re.IGNORECASE)
+
+    def iter_roots(self, text: str) -> Iterator[Tuple[str, int]]:
+        """
+        Single left-to-right pass yielding ``(root, offset)`` for every
+        keyword hit.  Restarting one character after each hit keeps
+        overlapping keywords (e.g. ``MCHemoglobin``) visible.
+        """
+        # A case-sensitive scan over the lowered text is several times faster
+        # than an IGNORECASE one; it is only valid while offsets line up and
+        # no character case-folds onto an ASCII letter without lowering to it.
+        haystack = text.lower()
+        if len(haystack) != len(text) or _FOLD_ONLY_RE.search(text):
+            yield from self._iter_roots_folded(text)
+            return
+        search = self._root_re.search
+        hit = search(haystack)
+        while hit:
+            yield hit.group(0), hit.start()
+            hit = search(haystack, hit.start() + 1)
+
+    def _iter_roots_folded(self, text: str) -> Iterator[Tuple[str, int]]:
+        search = self._root_re_ci.search
+        hit = search(text)
+        while hit:
+            yield hit.group(0).translate(_FOLD_TABLE).lower(), hit.start()
+            hit = search(text, hit.start() + 1)
+
+    def find(self, text: str) -> List[Tuple[tuple, "re.Match"]]:
+        """
+        Return ``(spec, match)`` for every test found, in pattern order.
+        ``match`` is identical to ``re.search(pattern, text, re.IGNORECASE)``.
+        The scan stops as soon as every test has been matched.
+        """
+        pending: Dict[str, List[int]] = {}
+        for i, root in enumerate(self._spec_root):
+            pending.setdefault(root, []).append(i)
+
+        matches: Dict[int, "re.Match"] = {}
+        for root, start in self.iter_roots(text):
+            waiting = pending.get(root)
+            if not waiting:
+                continue
+            for i in list(waiting):
+                match = self.specs[i][0].match(text, start)
+                if match:
+                    matches[i] = match
+                    waiting.remove(i)
+            if len(matches) == len(self.specs):
+                break
+
+        return [(self.specs[i], matches[i]) for i in sorted(matches)]
+
+    def name_at_start(self, text: str) -> Optional[str]:
+        """Test whose pattern matches at the very start of ``text`` ("Hemoglobin (Hb) 9.1 g/dL")."""
+        return next((spec[1] for spec, match in self.find(text) if match.start() == 0), None)
+
+
+extractor = TestExtractor(TEST_PATTERNS)
+
+
+class PanelTracker:
+    """
+    Tests seen so far in a report that arrives page by page.  ``feed``
+    says whether every panel detected so far (any of its tests seen) has
+    all of its expected tests, i.e. whether more pages can only repeat
+    what is already known.
+    """
+
+    def __init__(self, panels: Mapping[str, FrozenSet[str]]):
+        self.panels = panels
+        self.found: Set[str] = set()
+
+    def feed(self, page_text: str) -> bool:
+        self.found.update(spec[1] for spec, _ in extractor.find(page_text))
+        return self.complete
+
+    @property
+    def detected(self) -> List[str]:
+        return [name for name, tests in self.panels.items() if tests & self.found]
+
+    @property
+    def complete(self) -> bool:
+        detected = self.detected
+        return bool(detected) and all(self.panels[name] <= self.found for name in detected)
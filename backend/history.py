@@ -0,0 +1,232 @@
+# backend/history.py
+"""
+Patient history: every analysed report's test results, persisted in SQLite
+and indexed by (patient, test, date), so trend views never need the original
+files again.
+
+``trends`` pulls all requested rows in one indexed query and computes the
+per-test statistics with NumPy over the whole column set at once (grouped
+reductions via ``np.add.reduceat``) rather than looping over reports.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id          INTEGER PRIMARY KEY,
+    patient_id  TEXT NOT NULL,
+    content_key TEXT NOT NULL,
+    filename    TEXT,
+    report_date TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    UNIQUE (patient_id, content_key)
+);
+CREATE TABLE IF NOT EXISTS results (
+    report_id   INTEGER NOT NULL REFERENCES reports(id),
+    patient_id  TEXT NOT NULL,
+    test        TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    value       REAL NOT NULL,
+    unit        TEXT,
+    status      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_patient_test_ts ON results(patient_id, test, ts);
+"""
+
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_ISO_DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_DMY_DATE_RE = re.compile(r"(\d{1,2})[/\-. ]([A-Za-z]{3})[A-Za-z]*[/\-. ](\d{2,4})|(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{2,4})")
+_DAY = 86400.0
+
+
+def parse_report_date(raw: Optional[str]) -> Optional[datetime]:
+    """Best-effort parse of the report's date field (day-first, as our labs print it)."""
+    if not raw:
+        return None
+    try:
+        m = _ISO_DATE_RE.search(raw)
+        if m:
+            return datetime(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        m = _DMY_DATE_RE.search(raw)
+        if not m:
+            return None
+        if m.group(2):
+            day, month, year = int(m.group(1)), _MONTHS.get(m.group(2).lower()), int(m.group(3))
+        else:
+            day, month, year = int(m.group(4)), int(m.group(5)), int(m.group(6))
+        if month is None:
+            return None
+        return datetime(year + 2000 if year < 100 else year, month, day)
+    except ValueError:
+        return None
+
+
+def patient_key(name: Optional[str]) -> Optional[str]:
+    """
+    Stable id for a patient derived from their name when the client gives
+    none; ``None`` (not recorded) unless ``HISTORY_KEY_BY_NAME`` is on.
+    """
+    if not name or not settings.HISTORY_KEY_BY_NAME:
+        return None
+    normalised = " ".join(name.lower().split())
+    return hashlib.sha256(normalised.encode()).hexdigest()[:16]
+
+
+class HistoryStore:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, patient_id: str, content_key: str, filename: str,
+               analysis: Dict[str, Any]) -> bool:
+        """Store one report's results; re-uploads of the same file are ignored."""
+        when = parse_report_date(analysis["patient_info"].get("date")) or datetime.now()
+        ts = when.timestamp()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO reports (patient_id, content_key, filename, report_date, ts)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (patient_id, content_key, filename, when.date().isoformat(), ts),
+                )
+                if cur.rowcount:
+                    self._conn.executemany(
+                        "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        [(cur.lastrowid, patient_id, t["test"], ts, t["value"], t["unit"], t["status"])
+                         for t in analysis["test_results"]],
+                    )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return bool(cur.rowcount)
+
+    def rows(self, patient_id: str, tests: Optional[Sequence[str]] = None) -> List[tuple]:
+        query = "SELECT test, ts, value, unit, status FROM results WHERE patient_id = ?"
+        params: List[Any] = [patient_id]
+        if tests:
+            query += f" AND test IN ({','.join('?' * len(tests))})"
+            params.extend(tests)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY test, ts", params).fetchall()
+
+    def reclassify(self, ranges: Mapping[str, Tuple[float, float]]) -> Dict[str, int]:
+        """
+        Re-flag the stored results of the tests in ``ranges`` in one
+        vectorised pass; results of other tests keep their status.
+        """
+        from reclassify import classify
+
+        if not ranges:
+            return {"rows": 0, "changed": 0}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid, test, value, status FROM results WHERE test IN ({','.join('?' * len(ranges))})",
+                list(ranges),
+            ).fetchall()
+        if not rows:
+            return {"rows": 0, "changed": 0}
+        rowids, tests, values, old = zip(*rows)
+        new = classify(tests, values, ranges).status
+        changed = np.flatnonzero(new != np.asarray(old, dtype=object))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE results SET status = ? WHERE rowid = ?",
+                ((new[i], rowids[i]) for i in changed),
+            )
+            self._conn.execute("COMMIT")
+        return {"rows": len(rows), "changed": int(len(changed))}
+
+    def trends(self, patient_id: str, tests: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        return compute_trends(self.rows(patient_id, tests))
+
+
+def compute_trends(rows: List[tuple]) -> Dict[str, Any]:
+    """
+    Time series and summary statistics per test from ``(test, ts, value,
+    unit, status)`` rows sorted by (test, ts).
+    """
+    if not rows:
+        return {}
+    tests, ts, values, units, statuses = zip(*rows)
+    ts = np.asarray(ts, dtype=float)
+    values = np.asarray(values, dtype=float)
+    abnormal = np.asarray(statuses) != "Normal"
+    n_rows = len(rows)
+
+    # group boundaries: rows are sorted by test, so each test is one run
+    starts = np.flatnonzero(np.r_[True, np.asarray(tests[1:]) != np.asarray(tests[:-1])])
+    ends = np.r_[starts[1:], n_rows]
+    counts = ends - starts
+    last = ends - 1
+
+    # least-squares slope per test (value units per day), all groups at once
+    days = (ts - ts[starts].repeat(counts)) / _DAY
+    sx = np.add.reduceat(days, starts)
+    sy = np.add.reduceat(values, starts)
+    sxx = np.add.reduceat(days * days, starts)
+    sxy = np.add.reduceat(days * values, starts)
+    denom = counts * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (counts * sxy - sx * sy) / denom, np.nan)
+
+    prev = np.where(counts > 1, last - 1, last)
+    last_delta = np.where(counts > 1, values[last] - values[prev], np.nan)
+
+    # out-of-range streaks: running count of abnormal rows since the last
+    # normal row or group start ("break"), from one cumulative sum
+    cum = np.cumsum(abnormal)
+    breaks = ~abnormal
+    breaks[starts] = True
+    base = cum - abnormal                      # abnormal rows strictly before i
+    last_break = np.maximum.accumulate(np.where(breaks, np.arange(n_rows), 0))
+    run = cum - base[last_break]
+    current_streak = run[last]
+    longest_streak = np.maximum.reduceat(run, starts)
+
+    mean = sy / counts
+    minimum = np.minimum.reduceat(values, starts)
+    maximum = np.maximum.reduceat(values, starts)
+
+    trends = {}
+    for g, (start, end) in enumerate(zip(starts, ends)):
+        trends[tests[start]] = {
+            "unit": units[end - 1],
+            "series": [
+                {"date": datetime.fromtimestamp(ts[i]).date().isoformat(),
+                 "value": float(values[i]), "status": statuses[i]}
+                for i in range(start, end)
+            ],
+            "stats": {
+                "count": int(counts[g]),
+                "first": float(values[start]),
+                "last": float(values[end - 1]),
+                "min": float(minimum[g]),
+                "max": float(maximum[g]),
+                "mean": round(float(mean[g]), 4),
+                "slope_per_day": None if np.isnan(slope[g]) else round(float(slope[g]), 6),
+                "last_delta": None if np.isnan(last_delta[g]) else round(float(last_delta[g]), 4),
+                "out_of_range_streak": int(current_streak[g]),
+                "longest_out_of_range_streak": int(longest_streak[g]),
+            },
+        }
+    return trends
+
+
+def open_history() -> Optional[HistoryStore]:
+    if not settings.HISTORY_DB_PATH:
+        return None
+    return HistoryStore(settings.HISTORY_DB_PATH)
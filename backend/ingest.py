@@ -0,0 +1,206 @@
+# backend/ingest.py
+"""
+Size-capped streaming ingestion of uploads.
+
+``receive_form`` parses the multipart request body itself, straight from
+``request.stream()``: the request is refused from its Content-Length or,
+failing that, as soon as the bytes received pass the cap, and each file part
+is written once, to a named temp file, hashed as it arrives.  ``spool_member``
+does the same for a zip archive member.  Extractors are then handed the file
+*path* (see ``ocr.Source``), which also keeps the upload from being pickled
+into OCR worker processes.
+"""
+import hashlib
+import os
+import tempfile
+import zipfile
+from contextlib import asynccontextmanager
+from functools import partial
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+import metrics
+import settings
+
+# Allowance for multipart boundaries, part headers and form fields around the files.
+_MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the {max_bytes} byte limit")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+class ReceivedForm(NamedTuple):
+    fields: Dict[str, str]
+    # (filename, spooled file, or UploadTooLarge for a file over the cap), in upload order
+    files: List[Tuple[str, Union[SpooledUpload, UploadTooLarge]]]
+
+    def single_file(self) -> Tuple[str, SpooledUpload]:
+        """The one uploaded file; raises UploadTooLarge if it was over the cap"""
+        if not self.files:
+            raise HTTPException(status_code=422, detail="A file upload is required")
+        filename, spooled = self.files[0]
+        if isinstance(spooled, UploadTooLarge):
+            raise spooled
+        return filename, spooled
+
+
+def _temp_path(filename: str) -> Tuple[int, str]:
+    return tempfile.mkstemp(
+        prefix="healthscan-",
+        suffix=Path(filename or "").suffix.lower(),
+        dir=settings.UPLOAD_TMP_DIR,
+    )
+
+
+class _Spool:
+    def __init__(self, filename: str, path: str, max_bytes: int):
+        self.filename = filename
+        self.path = path
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.too_large = False
+
+
+class _SpoolingParser(MultiPartParser):
+    """
+    Starlette's multipart parser with each file part written to its own named
+    temp file (instead of an anonymous spool that would have to be copied
+    again to get a path), hashed and size-capped as it arrives.  A file over
+    the cap stops being written and is reported as UploadTooLarge.
+    """
+
+    def __init__(self, request: Request, stream, max_files: int, max_bytes: int, max_archive_bytes: int):
+        super().__init__(request.headers, stream, max_files=max_files)
+        self.max_bytes = max_bytes
+        self.max_archive_bytes = max_archive_bytes
+        self.spools: List[_Spool] = []
+        self._current_spool: Optional[_Spool] = None
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is None:
+            self._current_spool = None
+            return
+        upload.file.close()
+        fd, path = _temp_path(upload.filename)
+        is_archive = (upload.filename or "").lower().endswith(".zip")
+        self._current_spool = _Spool(upload.filename, path, self.max_archive_bytes if is_archive else self.max_bytes)
+        self.spools.append(self._current_spool)
+        upload.file = os.fdopen(fd, "w+b")
+        self._files_to_close_on_error[-1] = upload.file
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        spool = self._current_spool
+        if spool is None:
+            return super().on_part_data(data, start, end)
+        spool.size += end - start
+        if spool.too_large or spool.size > spool.max_bytes:
+            spool.too_large = True
+            return
+        spool.digest.update(memoryview(data)[start:end])
+        super().on_part_data(data, start, end)
+
+
+async def _capped(stream, limit: int, max_bytes: int):
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise UploadTooLarge(max_bytes)
+        yield chunk
+
+
+@asynccontextmanager
+async def receive_form(request: Request, max_files: int = 1, max_bytes: Optional[int] = None,
+                       max_archive_bytes: Optional[int] = None):
+    """
+    Read a multipart upload of up to ``max_files`` files of ``max_bytes``
+    each (zip archives up to ``max_archive_bytes``, their members being
+    capped when unpacked); yields a ``ReceivedForm`` and deletes the
+    spooled files on exit.  Raises UploadTooLarge once the body is larger
+    than the files it may carry, before or while it is read.
+    """
+    max_bytes = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    max_archive_bytes = max_bytes if max_archive_bytes is None else max_archive_bytes
+    limit = max(max_bytes * max_files, max_archive_bytes) + _MULTIPART_OVERHEAD
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > limit:
+        raise UploadTooLarge(max_bytes)
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=422, detail="Expected a multipart/form-data upload")
+
+    parser = _SpoolingParser(
+        request, _capped(request.stream(), limit, max_bytes), max_files, max_bytes, max_archive_bytes
+    )
+    try:
+        with metrics.span("upload_read"):
+            try:
+                form = await parser.parse()
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message)
+            # parse() leaves the files open at offset 0; flush them for readers by path
+            for _, value in form.multi_items():
+                if not isinstance(value, str):
+                    await value.close()
+        files = []
+        for spool in parser.spools:
+            if spool.too_large:
+                files.append((spool.filename, UploadTooLarge(spool.max_bytes)))
+                continue
+            metrics.UPLOAD_BYTES.observe(spool.size)
+            files.append((spool.filename, SpooledUpload(spool.path, spool.size, spool.digest.hexdigest())))
+        fields = {name: value for name, value in form.multi_items() if isinstance(value, str)}
+        yield ReceivedForm(fields, files)
+    finally:
+        for spool in parser.spools:
+            try:
+                os.unlink(spool.path)
+            except FileNotFoundError:
+                pass
+
+
+@asynccontextmanager
+async def _spool(read: Callable[[int], Awaitable[bytes]], filename: str, max_bytes: Optional[int]):
+    """Copy ``read(n)`` chunks to a temp file; yields a ``SpooledUpload``, deletes it on exit."""
+    max_bytes = settings.MAX_UPLOAD_BYTES if max_bytes is None else max_bytes
+    fd, path = _temp_path(filename)
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with metrics.span("upload_read"), os.fdopen(fd, "wb") as out:
+            while chunk := await read(settings.UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                out.write(chunk)
+        metrics.UPLOAD_BYTES.observe(size)
+        yield SpooledUpload(path, size, digest.hexdigest())
+    finally:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+@asynccontextmanager
+async def spool_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: Optional[int] = None):
+    """Spool one member of a zip archive to a temp file, decompressed chunk by chunk."""
+    with archive.open(info) as member:
+        async with _spool(partial(run_in_threadpool, member.read), info.filename, max_bytes) as spooled:
+            yield spooled
@@ -0,0 +1,117 @@
+# backend/job_worker.py
+"""
+Worker processes that drain the SQLite job queue (see ``jobs.py``).
+
+Run next to the API, from ``backend/``:
+
+    python job_worker.py               # HEALTHSCAN_JOB_WORKERS processes
+    python job_worker.py --workers 4
+
+Workers are independent of the API process: either side can restart
+without losing queued work.  The supervisor restarts workers that die; the
+job they were holding is retried by whoever claims it after its lease runs
+out.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import settings
+from jobs import JobStore, open_store
+
+
+@contextmanager
+def _keep_lease(store: JobStore, job_id: str, worker: str):
+    """Renew the job's lease in the background for as long as we work on it."""
+    done = threading.Event()
+
+    def renew():
+        while not done.wait(store.lease_seconds / 3):
+            store.renew(job_id, worker)
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_worker() -> None:
+    import ocr
+    from cache import digest_key
+    from history import open_history, patient_key
+    from analysis import report_from_text
+
+    if settings.OCR_PRELOAD:
+        ocr.warm_up()
+    store = open_store()
+    history = open_history()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷  Job worker {worker} ready")
+
+    while True:
+        job = store.claim(worker)
+        if job is None:
+            time.sleep(settings.JOB_POLL_SECONDS)
+            continue
+        with _keep_lease(store, job["job_id"], worker):
+            try:
+                filename = job["filename"].lower()
+                with store.spooled_payload(job) as (path, sha256):
+                    extraction = ocr.extract_report(filename, path)
+                result = report_from_text(extraction.text)
+                if "error" not in result:
+                    result["pages"] = extraction.summary()
+                patient_id = job["patient_id"] or patient_key(
+                    result.get("analysis", {}).get("patient_info", {}).get("name")
+                )
+                if history is not None and patient_id and "error" not in result:
+                    history.record(patient_id, digest_key(filename, sha256), job["filename"], result["analysis"])
+                    result = {"patient_id": patient_id, **result}
+            except Exception as e:
+                result = {"error": str(e)}
+        store.finish(job["job_id"], worker, result)
+
+
+def supervise(workers: int) -> None:
+    # spawn, not fork: torch's thread pools do not survive a fork.
+    ctx = multiprocessing.get_context("spawn")
+    procs = []
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    try:
+        while not stopping:
+            for p in procs:
+                if not p.is_alive():
+                    print(f"⚠️  Job worker pid={p.pid} exited with {p.exitcode}, restarting")
+            procs = [p for p in procs if p.is_alive()]
+            for _ in range(workers - len(procs)):
+                p = ctx.Process(target=run_worker, daemon=True)
+                p.start()
+                procs.append(p)
+            time.sleep(1)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the HealthScan job queue")
+    parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+    supervise(parser.parse_args().workers)
@@ -0,0 +1,204 @@
+# backend/jobs.py
+"""
+Durable local job queue backed by SQLite.
+
+The API enqueues uploads with ``JobStore.enqueue`` and answers immediately;
+``job_worker.py`` processes claim jobs highest-priority-first.  A claim is a
+time-limited lease that the worker keeps renewing while it runs; if the worker
+dies the lease lapses and the next ``claim`` picks the job up again, until
+``max_attempts`` is spent.  Nothing lives in API memory, so API restarts and
+worker restarts both leave the queue intact.
+
+Payloads are streamed into and out of their BLOB in ``UPLOAD_CHUNK_BYTES``
+chunks with incremental BLOB I/O (``Connection.blobopen``), which needs
+Python 3.11+.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    filename     TEXT NOT NULL,
+    payload      BLOB,
+    patient_id   TEXT,                   -- as given to POST /jobs, else derived from the report
+    priority     INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL,          -- queued | running | done | failed
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_until  REAL,
+    worker       TEXT,
+    result       TEXT,
+    error        TEXT,
+    created      REAL NOT NULL,
+    updated      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs(status, priority DESC, created);
+"""
+
+
+class JobStore:
+    def __init__(self, path: str, lease_seconds: float, max_attempts: int):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        with self._transaction() as conn:
+            # queues created before jobs carried a patient id
+            if "patient_id" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN patient_id TEXT")
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front so two workers can never
+        # claim the same row.
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ───────────────────────────  API side  ───────────────────────────
+    def enqueue(self, filename: str, payload: Union[bytes, str], priority: int = 0,
+                patient_id: Optional[str] = None) -> str:
+        """
+        Queue ``payload`` — bytes, or the path of a spooled upload, which is
+        copied into the row in ``UPLOAD_CHUNK_BYTES`` chunks rather than
+        read into memory.  ``patient_id`` is who the results are recorded
+        under in the history.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            if isinstance(payload, bytes):
+                conn.execute(
+                    "INSERT INTO jobs (id, filename, payload, patient_id, priority, status, max_attempts, created, updated)"
+                    " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, filename, payload, patient_id, priority, self.max_attempts, now, now),
+                )
+            else:
+                rowid = conn.execute(
+                    "INSERT INTO jobs (id, filename, payload, patient_id, priority, status, max_attempts, created, updated)"
+                    " VALUES (?, ?, zeroblob(?), ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, filename, os.path.getsize(payload), patient_id, priority, self.max_attempts, now, now),
+                ).lastrowid
+                with open(payload, "rb") as src, conn.blobopen("jobs", "payload", rowid) as blob:
+                    while chunk := src.read(settings.UPLOAD_CHUNK_BYTES):
+                        blob.write(chunk)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, filename, priority, status, attempts, result, error, created, updated"
+                " FROM jobs WHERE id = ?", (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(
+            ("job_id", "filename", "priority", "status", "attempts", "result", "error", "created", "updated"),
+            row,
+        ))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # ──────────────────────────  Worker side  ─────────────────────────
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next job: highest priority, then oldest.  Jobs whose lease
+        ran out (their worker crashed) are eligible again while they have
+        attempts left, and are failed once they do not.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', payload = NULL, updated = ?,"
+                " error = 'worker crashed on every attempt'"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                (now, now),
+            )
+            row = conn.execute(
+                "SELECT id, filename, rowid, attempts, patient_id FROM jobs"
+                " WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY priority DESC, created LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " lease_until = ?, worker = ?, updated = ? WHERE id = ?",
+                (now + self.lease_seconds, worker, now, row[0]),
+            )
+        return {"job_id": row[0], "filename": row[1], "rowid": row[2], "attempt": row[3] + 1, "patient_id": row[4]}
+
+    @contextmanager
+    def spooled_payload(self, job: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+        """
+        Copy a claimed job's payload out to a temp file, hashing it on the
+        way; yields ``(path, sha256)`` and deletes the file on exit.
+        """
+        fd, path = tempfile.mkstemp(
+            prefix="healthscan-job-",
+            suffix=Path(job["filename"]).suffix.lower(),
+            dir=settings.UPLOAD_TMP_DIR,
+        )
+        try:
+            digest = hashlib.sha256()
+            # A read transaction keeps the row (and so the BLOB handle) stable
+            # even if another worker reclaims the job meanwhile; the lock holds
+            # off our own lease renewals, which would expire the handle.
+            with self._lock, os.fdopen(fd, "wb") as out:
+                self._conn.execute("BEGIN")
+                try:
+                    with self._conn.blobopen("jobs", "payload", job["rowid"], readonly=True) as blob:
+                        while chunk := blob.read(settings.UPLOAD_CHUNK_BYTES):
+                            digest.update(chunk)
+                            out.write(chunk)
+                finally:
+                    self._conn.execute("COMMIT")
+            yield path, digest.hexdigest()
+        finally:
+            os.unlink(path)
+
+    def renew(self, job_id: str, worker: str) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated = ?"
+                " WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, worker),
+            )
+
+    def finish(self, job_id: str, worker: str, result: Dict[str, Any]) -> None:
+        """Store the result; a result containing ``error`` marks the job failed."""
+        status = "failed" if "error" in result else "done"
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, payload = NULL,"
+                " lease_until = NULL, updated = ? WHERE id = ? AND worker = ?",
+                (status, json.dumps(result), result.get("error"), time.time(), job_id, worker),
+            )
+
+
+def open_store() -> JobStore:
+    return JobStore(settings.JOBS_DB_PATH, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS)
@@ -0,0 +1,196 @@
+# backend/layout.py
+"""
+Lab table rows rebuilt from the word boxes of a PDF page with selectable
+text, instead of from its flattened text.
+
+``page.get_text()`` turns a table into lines whose cells are only told
+apart by runs of spaces, and loses them entirely when the PDF draws each
+cell separately; the regex parsers then have to guess which number belongs
+to which test.  Here every word keeps its box:
+
+* words whose vertical centres line up form one visual line, sorted left
+  to right;
+* a horizontal gap wider than ``CELL_GAP`` × the line height splits a line
+  into cells;
+* when the page has a header row (``Test  Result  Unit  Reference Range``
+  and the like), each cell goes to the header column it overlaps most;
+  without one, the first numeric cell is the value, the cells before it
+  the test name, and of the cells after it a ``lo - hi`` / ``< hi`` cell is
+  the range and the first other one the unit.
+
+A line becomes a ``parser.Row`` only if it has a name, a value and a unit
+or range, so headers, addresses and footers drop out on their own.  Names
+are mapped onto the rules' test names (aliases such as "Haemoglobin", or
+the CBC patterns), and a row without a printed range gets the rules' one.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import fitz
+
+from extractor import extractor
+from parser import UNITS, Row
+from rules import registry
+
+CELL_GAP = 0.4              # × line height; one space is ~0.25 of it, two ~0.5
+LINE_TOLERANCE = 0.5        # × word height, between vertical centres on one line
+
+_NUM = r"\d[\d,]*(?:\.\d+)?"
+VALUE_RE = re.compile(fr"^\*?({_NUM})\s*(?:\*|H|L|High|Low)?$", re.IGNORECASE)
+RANGE_RE = re.compile(fr"^({_NUM})\s*(?:-|–|to)\s*({_NUM})\s*(\S*)$")
+LIMIT_RE = re.compile(fr"^(<|>|≤|≥|<=|>=|Up to)\s*({_NUM})\s*(\S*)$", re.IGNORECASE)
+
+_DIGIT = re.compile(r"\d")
+
+HEADERS = (
+    ("name", ("test", "investigation", "parameter", "analyte", "description", "examination")),
+    ("value", ("result", "value", "observed")),
+    ("unit", ("unit",)),
+    ("range", ("reference", "range", "interval", "normal", "biological")),
+)
+
+_HEADER_WORD = re.compile("|".join(k for _, keys in HEADERS for k in keys), re.IGNORECASE)
+
+Word = Tuple[float, float, float, float, str]       # x0, y0, x1, y1, text
+Cell = Tuple[float, float, str]                     # x0, x1, text
+Columns = List[Tuple[float, float, str]]            # x0, x1, role
+
+
+def _number(s: str) -> float:
+    return float(s.replace(",", ""))
+
+
+def _lines(words: Sequence[tuple]) -> List[List[Word]]:
+    """
+    Group words into visual lines by their vertical centres, each sorted by x.
+    MuPDF's own lines (words sharing block and line number) are kept whole;
+    only they are compared, which matters where every cell is its own block.
+    """
+    fragments: List[List[Word]] = []
+    last = None
+    for x0, y0, x1, y1, text, block, line, _ in words:
+        if (block, line) != last:
+            fragments.append([])
+            last = (block, line)
+        fragments[-1].append((x0, y0, x1, y1, text))
+    fragments.sort(key=lambda f: f[0][1] + f[0][3])
+
+    lines: List[List[Word]] = []
+    centre = height = 0.0
+    for fragment in fragments:
+        first = fragment[0]
+        mid = (first[1] + first[3]) / 2
+        if lines and abs(mid - centre) <= LINE_TOLERANCE * height:
+            lines[-1].extend(fragment)
+            lines[-1].sort()
+        else:
+            lines.append(fragment)
+            centre, height = mid, first[3] - first[1]
+    return lines
+
+
+def _cells(line: List[Word]) -> List[Cell]:
+    """Split a visual line at gaps wider than a space or two."""
+    gap = CELL_GAP * (line[0][3] - line[0][1])
+    cells: List[List[Word]] = [[line[0]]]
+    for w in line[1:]:
+        if w[0] - cells[-1][-1][2] > gap:
+            cells.append([w])
+        else:
+            cells[-1].append(w)
+    return [(c[0][0], c[-1][2], " ".join(w[4] for w in c)) for c in cells]
+
+
+def _header(cells: List[Cell]) -> Optional[Columns]:
+    """Column spans and roles if this line is a table header (needs name and value)."""
+    columns = []
+    for x0, x1, text in cells:
+        lowered = text.lower()
+        role = next((r for r, keys in HEADERS if any(k in lowered for k in keys)), None)
+        if role and role not in (c[2] for c in columns):
+            columns.append((x0, x1, role))
+    roles = {c[2] for c in columns}
+    return columns if {"name", "value"} <= roles else None
+
+
+def _by_column(cells: List[Cell], columns: Columns) -> Dict[str, str]:
+    """Assign each cell to the header column it overlaps most (nearest centre if none)."""
+    assigned: Dict[str, List[str]] = {}
+    for x0, x1, text in cells:
+        def fit(col):
+            overlap = min(x1, col[1]) - max(x0, col[0])
+            return (overlap, -abs((x0 + x1) - (col[0] + col[1])))
+        role = max(columns, key=fit)[2]
+        assigned.setdefault(role, []).append(text)
+    return {role: " ".join(texts) for role, texts in assigned.items()}
+
+
+def _by_order(cells: List[Cell]) -> Dict[str, str]:
+    """Roles from cell order when the page has no header row."""
+    texts = [c[2] for c in cells]
+    at = next((i for i, t in enumerate(texts) if i and VALUE_RE.match(t)), None)
+    if at is None:
+        return {}
+    roles = {"name": " ".join(texts[:at]), "value": texts[at]}
+    for text in texts[at + 1:]:
+        if "range" not in roles and (RANGE_RE.match(text) or LIMIT_RE.match(text)):
+            roles["range"] = text
+        elif "unit" not in roles and not VALUE_RE.match(text):
+            roles["unit"] = text
+    return roles
+
+
+def _range(text: str) -> Tuple[Optional[float], Optional[float], str]:
+    """(low, high, unit written after the range) of a reference range cell."""
+    match = RANGE_RE.match(text)
+    if match:
+        return _number(match.group(1)), _number(match.group(2)), match.group(3)
+    match = LIMIT_RE.match(text)
+    if match:
+        bound = _number(match.group(2))
+        if match.group(1) in (">", "≥", ">="):
+            return bound, None, match.group(3)
+        return None, bound, match.group(3)
+    return None, None, ""
+
+
+def _row(roles: Dict[str, str]) -> Optional[Row]:
+    name = roles.get("name", "").strip(" :.-")
+    value = VALUE_RE.match(roles.get("value", ""))
+    if not value or not any(c.isalpha() for c in name):
+        return None
+    low, high, range_unit = _range(roles.get("range", ""))
+    unit = roles.get("unit", "") or range_unit
+    if low is None and high is None and not unit:
+        return None
+    rules = registry.rules
+    name = rules.canonical(name) or extractor.name_at_start(f"{name} {value.group(1)} {unit}") or name
+    if low is None and high is None:
+        low, high = rules.ranges.get(name, (None, None))
+        unit = UNITS.get(name, unit)
+    number = _number(value.group(1))
+
+    status = "normal"
+    if low is not None and number < low:
+        status = "low"
+    elif high is not None and number > high:
+        status = "high"
+    return Row(name, number, unit, low, high, status)
+
+
+def page_rows(page: "fitz.Page", textpage: Optional["fitz.TextPage"] = None) -> List[Row]:
+    """Result rows of one page, top to bottom (see module docstring)."""
+    rows = []
+    columns: Optional[Columns] = None
+    for line in _lines(page.get_text("words", textpage=textpage)):
+        text = " ".join(w[4] for w in line)
+        if not _DIGIT.search(text):
+            # prose, or the header row of a table
+            if _HEADER_WORD.search(text):
+                columns = _header(_cells(line)) or columns
+            continue
+        cells = _cells(line)
+        row = _row(_by_column(cells, columns) if columns else _by_order(cells))
+        if row is not None:
+            rows.append(row)
+    return rows
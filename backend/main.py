@@ -1,13 +1,38 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from ocr import extract_text_from_file
-import re
-from typing import Dict, List, Any
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from ocr import extract_report, Source
+from analysis import PARSERS, analyze_medical_report, report_from_text
+from cache import build_cache, content_key, digest_key, SingleFlight
+from ingest import receive_form, spool_member, UploadTooLarge
+from ocr_pool import build_pool, PoolSaturated
+from jobs import open_store
+from history import open_history, patient_key
+from reclassify import reclassify, ranges_from
+from rules import registry
+from pydantic import BaseModel
+import metrics
+from typing import Dict, List, Any, Optional, Tuple
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import partial
+import asyncio
+import json
+import queue
+import time
+import zipfile
+import settings
 from datetime import datetime
-from enum import Enum
 
 app = FastAPI()
 
+result_cache = build_cache()
+single_flight = SingleFlight()
+ocr_pool = build_pool()
+job_store = open_store()
+history = open_history()
+
 # Allow frontend connection
 app.add_middleware(
     CORSMiddleware,
@@ -17,357 +42,378 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class BodyPart(Enum):
-    HEAD = "Head"
-    NECK = "Neck"
-    CHEST = "Chest"
-    ABDOMEN = "Abdomen"
-    PELVIS = "Pelvis"
-    ARM = "Arm"
-    LEG = "Leg"
-    FULL_BODY = "Full Body"
-    BLOOD_SYSTEM = "Blood System"
-    IMMUNE_SYSTEM = "Immune System"
-
-def map_test_to_body_part(test_name: str) -> BodyPart:
-    """Map medical tests to body parts/systems"""
-    test_mapping = {
-        # RBC Parameters
-        "Hemoglobin": BodyPart.BLOOD_SYSTEM,
-        "RBC Count": BodyPart.BLOOD_SYSTEM,
-        "PCV": BodyPart.BLOOD_SYSTEM,
-        "MCV": BodyPart.BLOOD_SYSTEM,
-        "MCH": BodyPart.BLOOD_SYSTEM,
-        "MCHC": BodyPart.BLOOD_SYSTEM,
-        "RDW (CV)": BodyPart.BLOOD_SYSTEM,
-        "RDW-SD": BodyPart.BLOOD_SYSTEM,
-        
-        # WBC Parameters
-        "TLC": BodyPart.IMMUNE_SYSTEM,
-        "Neutrophils": BodyPart.IMMUNE_SYSTEM,
-        "Lymphocytes": BodyPart.IMMUNE_SYSTEM,
-        "Monocytes": BodyPart.IMMUNE_SYSTEM,
-        "Eosinophils": BodyPart.IMMUNE_SYSTEM,
-        "Basophils": BodyPart.IMMUNE_SYSTEM,
-        
-        # Absolute Counts
-        "Neutrophils Absolute": BodyPart.IMMUNE_SYSTEM,
-        "Lymphocytes Absolute": BodyPart.IMMUNE_SYSTEM,
-        "Monocytes Absolute": BodyPart.IMMUNE_SYSTEM,
-        "Eosinophils Absolute": BodyPart.IMMUNE_SYSTEM,
-        "Basophils Absolute": BodyPart.IMMUNE_SYSTEM,
-        
-        # Platelets
-        "Platelet Count": BodyPart.BLOOD_SYSTEM,
-        
-        # Other common tests
-        "WBC": BodyPart.IMMUNE_SYSTEM,
-        "Platelets": BodyPart.BLOOD_SYSTEM,
-        "ALT": BodyPart.ABDOMEN,
-        "AST": BodyPart.ABDOMEN,
-        "Bilirubin": BodyPart.ABDOMEN,
-        "Creatinine": BodyPart.ABDOMEN,
-        "BUN": BodyPart.ABDOMEN,
-        "Troponin": BodyPart.CHEST,
-        "CK-MB": BodyPart.CHEST,
-        "TSH": BodyPart.NECK,
-        "T3": BodyPart.NECK,
-        "T4": BodyPart.NECK,
-        "Glucose": BodyPart.ABDOMEN,
-        "HbA1c": BodyPart.FULL_BODY,
-    }
-    return test_mapping.get(test_name, BodyPart.FULL_BODY)
-
-def analyze_medical_report(text: str) -> Dict[str, Any]:
-    """Analyze extracted medical report text and structure the data"""
-    analysis = {
-        "patient_info": {},
-        "test_results": [],
-        "summary": {},
-        "flags": [],
-        "body_analysis": {}
-    }
-    
-    # Extract patient information with more flexible patterns
-    patient_match = re.search(r"Patient\s*(?:NAME|Name)\s*:\s*([^\n]+)", text, re.IGNORECASE)
-    if patient_match:
-        analysis["patient_info"]["name"] = patient_match.group(1).strip()
+async def process_report(filename: str, source: Source, parser: str = "cbc",
+                         progress=None) -> Dict[str, Any]:
+    """Run extraction → analysis → insights on one uploaded file (bytes or spooled path)"""
+    # Extract text from file (OCR runs in the worker pool).  The generic table
+    # parsers have no panels to complete, so they always get every page.
+    early_stop = False if parser in ("table", "layout") else None
+    extraction = await ocr_pool.submit(
+        extract_report, filename, source, early_stop, progress, parser == "layout"
+    )
+    result = report_from_text(extraction.text, parser, extraction.rows)
+    if "error" not in result:
+        result["pages"] = extraction.summary()
+    return result
+
+async def _process_cached(filename: str, source: Source, key: Optional[str] = None,
+                          parser: str = "cbc", progress=None) -> Dict[str, Any]:
+    """
+    Serve repeat uploads from the result cache; coalesce concurrent ones
+    (only the request that does the work sees ``progress`` events).  The
+    rules version is part of the key, so an edited rules.json (ranges,
+    body parts, insights) is never answered with analyses made before it.
+    """
+    key = key or content_key(filename, source)
+    if parser != "cbc":
+        key = f"{key}:{parser}"
+    key = f"{key}@{registry.rules.version}"
+    result = await result_cache.aget(key)
+    metrics.CACHE_LOOKUPS.inc(result="miss" if result is None else "hit")
+    if result is not None:
+        return result
     
-    # Extract date from multiple possible fields
-    date_fields = ["Sample Collected", "Report Date", "Date"]
-    for field in date_fields:
-        date_match = re.search(fr"{field}\s*:\s*([^\n,]+)", text, re.IGNORECASE)
-        if date_match:
-            analysis["patient_info"]["date"] = date_match.group(1).strip()
-            break
+    async def compute():
+        result = await process_report(filename, source, parser, progress)
+        if "error" not in result:
+            await result_cache.aput(key, result)
+        return result
     
-    # Comprehensive test patterns for CBC reports
-    test_patterns = [
-        # RBC Parameters
-        (r"Hemoglobin\s*[^0-9]*([0-9.]+)\s*g/dL\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Hemoglobin", "g/dL", 13.0, 17.0),
-        (r"RBC\s*(?:Count)?\s*[^0-9]*([0-9.]+)\s*10\^?[6]?/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "RBC Count", "10^6/μl", 4.5, 5.5),
-        (r"PCV\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "PCV", "%", 40, 50),
-        (r"MCV\s*[^0-9]*([0-9.]+)\s*f?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "MCV", "fl", 83, 101),
-        (r"MCH\s*[^0-9]*([0-9.]+)\s*pg?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "MCH", "pg", 27, 32),
-        (r"MCHC\s*[^0-9]*([0-9.]+)\s*g/dL\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "MCHC", "g/dL", 31.5, 34.5),
-        (r"RDW\s*\(?CV\)?\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "RDW (CV)", "%", 11.6, 14.0),
-        (r"RDW-SD\s*[^0-9]*([0-9.]+)\s*f?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "RDW-SD", "fl", 35.1, 43.9),
-        
-        # WBC Parameters
-        (r"TLC\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "TLC", "10^3/μl", 4, 10),
-        (r"Neutrophils\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Neutrophils", "%", 40, 80),
-        (r"Lymphocytes\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Lymphocytes", "%", 20, 40),
-        (r"Monocytes\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Monocytes", "%", 2, 10),
-        (r"Eosinophils\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Eosinophils", "%", 1, 6),
-        (r"Basophils\s*[^0-9]*([0-9.]+)\s*%\s*(?:[^0-9]*<\s*([0-9.]+))?", "Basophils", "%", 0, 2),
-        
-        # Absolute Counts
-        (r"Neutrophils\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Neutrophils Absolute", "10^3/μl", 2, 7),
-        (r"Lymphocytes\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Lymphocytes Absolute", "10^3/μl", 1, 3),
-        (r"Monocytes\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Monocytes Absolute", "10^3/μl", 0.2, 1.0),
-        (r"Eosinophils\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Eosinophils Absolute", "10^3/μl", 0.02, 0.5),
-        (r"Basophils\.?\s*(?:Absolute)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Basophils Absolute", "10^3/μl", 0.02, 0.5),
+    return await single_flight.do(key, compute)
+
+async def _record_history(result: Dict[str, Any], key: str, filename: str,
+                          patient_id: Optional[str] = None) -> Optional[str]:
+    """Persist the structured results for trend queries; returns the patient id used"""
+    patient_id = patient_id or patient_key(result["analysis"]["patient_info"].get("name"))
+    if history is None or patient_id is None:
+        return patient_id
+    await run_in_threadpool(history.record, patient_id, key, filename, result["analysis"])
+    return patient_id
+
+def _multipart_body(**fields: Dict[str, Any]) -> Dict[str, Any]:
+    """OpenAPI request body for endpoints that read their form with ``receive_form``"""
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "properties": fields, "required": [name for name in fields if name.startswith("file")],
+    }}}}}
+
+_FILE = {"type": "string", "format": "binary"}
+
+@app.post("/upload", openapi_extra=_multipart_body(file=_FILE, patient_id={"type": "string"}))
+async def upload_file(request: Request, parser: str = "cbc"):
+    if parser not in PARSERS:
+        raise HTTPException(status_code=422, detail=f"parser must be one of {', '.join(PARSERS)}")
+    started = time.perf_counter()
+    try:
+        async with receive_form(request) as form:
+            upload_name, spooled = form.single_file()
+            filename = upload_name.lower()
+            key = digest_key(filename, spooled.sha256)
+            result = await _process_cached(filename, spooled.path, key, parser)
+        if "error" in result:
+            return result
         
-        # Platelets
-        (r"Platelet\s*(?:Count)?\s*[^0-9]*([0-9.]+)\s*10\^?3/?μ?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Platelet Count", "10^3/μl", 150, 410),
+        return {
+            "filename": upload_name,
+            "patient_id": await _record_history(result, key, upload_name, form.fields.get("patient_id")),
+            **result,
+            "processed_at": datetime.now().isoformat()
+        }
+
+    except HTTPException:
+        raise
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except PoolSaturated as e:
+        return JSONResponse(
+            status_code=503,
+            content={"error": str(e)},
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        metrics.UPLOAD_SECONDS.observe(time.perf_counter() - started)
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _drain(progress) -> List[Dict[str, Any]]:
+    events = []
+    while True:
+        try:
+            events.append(progress.get_nowait())
+        except queue.Empty:
+            return events
+
+def _progress_events(event: Dict[str, Any], parser: str, seen: set):
+    """Client-facing SSE lines for one stage event from ocr.py (page text is not forwarded)"""
+    if event["event"] == "document":
+        yield _sse("document", {"pages": event["pages"], "scanned": event["scanned"]})
+        return
+    yield _sse("page", {"page": event["page"], "pages": event["pages"], "source": event["source"]})
+    found = [t for t in analyze_medical_report(event["text"], parser)["test_results"] if t["test"] not in seen]
+    if found:
+        seen.update(t["test"] for t in found)
+        yield _sse("tests", {"page": event["page"], "test_results": found})
+
+class _CleanupStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose ``background`` runs however the response ends;
+    Starlette skips it when the client is gone before or while streaming.
+    """
+
+    async def __call__(self, scope, receive, send):
+        background, self.background = self.background, None
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if background is not None:
+                await asyncio.shield(background())
+
+async def _stream_report(upload_name: str, spooled, key: str, parser: str,
+                         patient_id: Optional[str], cleanup: AsyncExitStack):
+    try:
+        yield _sse("received", {"filename": upload_name, "bytes": spooled.size})
+        progress = ocr_pool.progress_queue()
+        job = asyncio.ensure_future(
+            _process_cached(upload_name.lower(), spooled.path, key, parser, progress)
+        )
+        # A client that goes away does not stop the work: it finishes, lands
+        # in the cache for the retry, and only then is the spooled file removed.
+        cleanup.push_async_callback(asyncio.wait, {job})
+        seen: set = set()
+        while True:
+            done, _ = await asyncio.wait({job}, timeout=0.2)
+            for event in _drain(progress):
+                for line in _progress_events(event, parser, seen):
+                    yield line
+            if done:
+                break
         
-        # Other common tests
-        (r"WBC\s*[^0-9]*([0-9.]+)\s*10\^?3/?u?l?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "WBC", "10^3/μl", 4.0, 11.0),
-        (r"Platelets\s*[^0-9]*([0-9.]+)\s*10\^?3?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Platelets", "10^3/μl", 150, 450),
-        (r"ALT\s*[^0-9]*([0-9.]+)\s*U/?L?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "ALT", "U/L", 7, 56),
-        (r"AST\s*[^0-9]*([0-9.]+)\s*U/?L?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "AST", "U/L", 8, 48),
-        (r"Glucose\s*[^0-9]*([0-9.]+)\s*mg/?dL?\s*(?:[^0-9]*([0-9.]+)\s*-\s*([0-9.]+))?", "Glucose", "mg/dL", 70, 100),
-    ]
-    
-    # Track affected body parts
-    affected_body_parts = set()
-    
-    for pattern_info in test_patterns:
-        if len(pattern_info) == 5:
-            pattern, test_name, unit, min_normal, max_normal = pattern_info
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                value = float(match.group(1))
-                
-                # Extract reference range if available, otherwise use defaults
-                ref_range = f"{min_normal}-{max_normal}"
-                if len(match.groups()) >= 3 and match.group(2) and match.group(3):
-                    ref_range = f"{match.group(2)}-{match.group(3)}"
-                
-                status = "Normal"
-                flag = ""
-                status_type = "normal"
-                
-                if value < min_normal:
-                    status = "Low"
-                    flag = "Below normal range"
-                    status_type = "low"
-                elif value > max_normal:
-                    status = "High"
-                    flag = "Above normal range"
-                    status_type = "high"
-                
-                test_result = {
-                    "test": test_name,
-                    "value": value,
-                    "unit": unit,
-                    "status": status,
-                    "status_type": status_type,
-                    "normal_range": ref_range,
-                    "flag": flag,
-                    "flag_message": flag,
-                    "body_part": map_test_to_body_part(test_name).value
-                }
-                
-                analysis["test_results"].append(test_result)
-                
-                if flag:
-                    analysis["flags"].append({
-                        "test": test_name,
-                        "message": flag,
-                        "severity": "warning" if status_type in ["low", "high"] else "info",
-                        "body_part": map_test_to_body_part(test_name).value
-                    })
-                    affected_body_parts.add(map_test_to_body_part(test_name))
-    
-    # Generate body analysis
-    analysis["body_analysis"] = {
-        "affected_parts": [part.value for part in affected_body_parts],
-        "most_affected_part": max(
-            affected_body_parts, 
-            key=lambda x: len([t for t in analysis["test_results"] 
-                            if map_test_to_body_part(t["test"]) == x and t["status"] != "Normal"]), 
-            default=BodyPart.FULL_BODY
-        ).value if affected_body_parts else "None",
-        "full_body_affected": BodyPart.FULL_BODY in affected_body_parts
-    }
-    
-    # Generate summary
-    total_tests = len(analysis["test_results"])
-    abnormal_tests = len([t for t in analysis["test_results"] if t["status"] != "Normal"])
+        result = job.result()
+        if "error" in result:
+            yield _sse("error", result)
+            return
+        yield _sse("result", {
+            "filename": upload_name,
+            "patient_id": await _record_history(result, key, upload_name, patient_id),
+            **result,
+            "processed_at": datetime.now().isoformat()
+        })
+    except PoolSaturated as e:
+        yield _sse("error", {"error": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        yield _sse("error", {"error": str(e)})
+
+@app.post("/upload/stream", openapi_extra=_multipart_body(file=_FILE, patient_id={"type": "string"}))
+async def upload_stream(request: Request, parser: str = "cbc"):
+    """
+    /upload as Server-Sent Events, for long scans: ``document`` once the
+    pages are triaged, ``page`` as each page is extracted or OCR'd,
+    ``tests`` with the test results that page adds, then ``result`` (the
+    /upload response body) or ``error``.
+    """
+    if parser not in PARSERS:
+        raise HTTPException(status_code=422, detail=f"parser must be one of {', '.join(PARSERS)}")
+    cleanup = AsyncExitStack()
+    try:
+        form = await cleanup.enter_async_context(receive_form(request))
+        upload_name, spooled = form.single_file()
+    except UploadTooLarge as e:
+        await cleanup.aclose()
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except BaseException:
+        await cleanup.aclose()
+        raise
     
-    analysis["summary"] = {
-        "total_tests": total_tests,
-        "normal_tests": total_tests - abnormal_tests,
-        "abnormal_tests": abnormal_tests,
-        "overall_status": "Normal" if abnormal_tests == 0 else "Attention Required",
-        "severity": "normal" if abnormal_tests == 0 else "warning",
-        "body_impact": analysis["body_analysis"]
+    key = digest_key(upload_name.lower(), spooled.sha256)
+    return _CleanupStreamingResponse(
+        _stream_report(upload_name, spooled, key, parser, form.fields.get("patient_id"), cleanup),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(cleanup.aclose),
+    )
+
+def _batch_entries(files, cleanup: AsyncExitStack):
+    """Yield (filename, spooler) for each report; zip archives are expanded"""
+    max_bytes = settings.MAX_UPLOAD_BYTES
+    for upload_name, spooled in files:
+        if isinstance(spooled, UploadTooLarge) or not upload_name.lower().endswith(".zip"):
+            yield upload_name, _spooled(spooled)
+            continue
+        try:
+            archive = cleanup.enter_context(zipfile.ZipFile(spooled.path))
+        except zipfile.BadZipFile as e:
+            yield upload_name, _spooled(e)
+            continue
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if info.file_size > max_bytes:
+                yield info.filename, _spooled(UploadTooLarge(max_bytes))
+                continue
+            yield info.filename, partial(spool_member, archive, info)
+
+def _spooled(entry):
+    """Spooler for an entry already on disk, or that could not be"""
+    @asynccontextmanager
+    async def spool():
+        if isinstance(entry, Exception):
+            raise entry
+        yield entry
+    return spool
+
+async def _process_batch_entry(index: int, filename: str, spool, slots: asyncio.Semaphore) -> Dict[str, Any]:
+    """One batch line; failures are reported in the line, never raised"""
+    async with slots:
+        try:
+            async with spool() as spooled:
+                key = digest_key(filename.lower(), spooled.sha256)
+                for attempt in range(settings.BATCH_SATURATED_RETRIES + 1):
+                    try:
+                        result = await _process_cached(filename.lower(), spooled.path, key)
+                        break
+                    except PoolSaturated as e:
+                        # other traffic is using the pool; a bulk import can wait
+                        if attempt == settings.BATCH_SATURATED_RETRIES:
+                            raise
+                        await asyncio.sleep(e.retry_after)
+            if "error" not in result:
+                result = {"patient_id": await _record_history(result, key, filename), **result}
+        except Exception as e:
+            result = {"error": str(e)}
+    return {
+        "index": index,
+        "filename": filename,
+        **result,
+        "processed_at": datetime.now().isoformat()
     }
-    
-    return analysis
 
-def generate_medical_insights(analysis: Dict[str, Any]) -> List[Dict[str, str]]:
-    """Generate medical insights based on the analysis"""
-    insights = []
-    
-    for test in analysis["test_results"]:
-        if test["status"] == "Low":
-            if test["test"] == "Hemoglobin":
-                insights.append({
-                    "message": "Low hemoglobin may indicate anemia. Consider iron supplementation and dietary changes.",
-                    "severity": "warning",
-                    "test": "Hemoglobin",
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] in ["TLC", "WBC"]:
-                insights.append({
-                    "message": "Low white blood cell count may indicate immune system concerns. Monitor for infections.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Platelet Count":
-                insights.append({
-                    "message": "Low platelet count may affect blood clotting. Avoid activities with bleeding risk.",
-                    "severity": "danger",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "RBC Count":
-                insights.append({
-                    "message": "Low red blood cell count may indicate anemia or blood loss. Follow up with healthcare provider.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Monocytes":
-                insights.append({
-                    "message": "Low monocyte count may indicate immune suppression or bone marrow issues.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Monocytes Absolute":
-                insights.append({
-                    "message": "Low absolute monocyte count may suggest immune system suppression.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
+@app.post("/upload/batch", openapi_extra=_multipart_body(files={"type": "array", "items": _FILE}))
+async def upload_batch(request: Request):
+    """
+    Process many reports (or zip archives of reports) concurrently and stream
+    one NDJSON line per report as soon as it finishes, in completion order,
+    followed by a summary line.
+    """
+    cleanup = AsyncExitStack()
+    try:
+        form = await cleanup.enter_async_context(receive_form(
+            request,
+            max_files=settings.BATCH_MAX_FILES,
+            max_archive_bytes=settings.MAX_UPLOAD_BYTES * settings.BATCH_MAX_FILES,
+        ))
+        if not form.files:
+            raise HTTPException(status_code=422, detail="A file upload is required")
+    except UploadTooLarge as e:
+        await cleanup.aclose()
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except BaseException:
+        await cleanup.aclose()
+        raise
+
+    async def stream():
+        slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+        tasks = []
+        for index, (filename, spool) in enumerate(_batch_entries(form.files, cleanup)):
+            over_limit = index >= settings.BATCH_MAX_FILES
+            if over_limit:
+                spool = _spooled(ValueError(f"Batch limited to {settings.BATCH_MAX_FILES} files; rest skipped"))
+            tasks.append(asyncio.create_task(_process_batch_entry(index, filename, spool, slots)))
+            if over_limit:
+                break
         
-        elif test["status"] == "High":
-            if test["test"] == "Hemoglobin":
-                insights.append({
-                    "message": "High hemoglobin may indicate dehydration or other conditions. Ensure adequate hydration.",
-                    "severity": "warning",
-                    "test": "Hemoglobin",
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] in ["TLC", "WBC"]:
-                insights.append({
-                    "message": "High white blood cell count may indicate infection or inflammation. Consider medical evaluation.",
-                    "severity": "danger",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Platelet Count":
-                insights.append({
-                    "message": "High platelet count may increase clotting risk. Monitor cardiovascular health.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Neutrophils":
-                insights.append({
-                    "message": "High neutrophil percentage may indicate bacterial infection or inflammation.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Lymphocytes":
-                insights.append({
-                    "message": "High lymphocyte percentage may indicate viral infection or immune response.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "Lymphocytes Absolute":
-                insights.append({
-                    "message": "High absolute lymphocyte count may suggest viral infection or chronic lymphocytic leukemia.",
-                    "severity": "danger",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-            elif test["test"] == "MCHC":
-                insights.append({
-                    "message": "High MCHC may indicate dehydration or hereditary spherocytosis. Monitor hydration levels.",
-                    "severity": "warning",
-                    "test": test["test"],
-                    "body_part": test["body_part"]
-                })
-    
-    # Add body-specific insights
-    if analysis["body_analysis"]["affected_parts"]:
-        affected_parts = analysis["body_analysis"]["affected_parts"]
-        most_affected = analysis["body_analysis"]["most_affected_part"]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                failed += "error" in line
+                yield json.dumps(line) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
         
-        if most_affected != "None":
-            insights.append({
-                "message": f"Most affected system: {most_affected}. Pay special attention to this area.",
-                "severity": "info",
-                "test": "Body Analysis",
-                "body_part": most_affected
-            })
+        yield json.dumps({"summary": {"total": len(tasks), "succeeded": len(tasks) - failed, "failed": failed}}) + "\n"
     
-    if not insights:
-        insights.append({
-            "message": "All test results appear within normal ranges. Maintain current health practices.",
-            "severity": "success",
-            "test": "Overall",
-            "body_part": "Full Body"
-        })
-    
-    return insights
+    body = stream()
+    cleanup.push_async_callback(body.aclose)   # cancels the entries still running first
+    return _CleanupStreamingResponse(
+        body, media_type="application/x-ndjson", background=BackgroundTask(cleanup.aclose)
+    )
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+@app.post("/jobs", status_code=202, openapi_extra=_multipart_body(
+    file=_FILE, patient_id={"type": "string"}, priority={"type": "integer"}
+))
+async def create_job(request: Request):
+    """Queue a report for background processing; poll GET /jobs/{job_id}"""
     try:
-        filename = file.filename.lower()
-        content = await file.read()
+        async with receive_form(request) as form:
+            upload_name, spooled = form.single_file()
+            try:
+                priority = int(form.fields.get("priority", 0))
+            except ValueError:
+                raise HTTPException(status_code=422, detail="priority must be an integer")
+            job_id = await run_in_threadpool(
+                job_store.enqueue, upload_name, spooled.path, priority, form.fields.get("patient_id") or None
+            )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {"job_id": job_id, "status": "queued", "priority": priority}
 
-        # Extract text from file
-        text = extract_text_from_file(filename, content)
-        
-        if not text.strip():
-            return {"error": "No text could be extracted from the file"}
-        
-        # Analyze the medical report
-        analysis = analyze_medical_report(text)
-        
-        # Generate insights
-        insights = generate_medical_insights(analysis)
-        
-        return {
-            "filename": file.filename,
-            "extracted_text": text,
-            "analysis": analysis,
-            "insights": insights,
-            "processed_at": datetime.now().isoformat()
-        }
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job
 
-    except Exception as e:
-        return {"error": str(e)}
+@app.get("/patients/{patient_id}/trends")
+async def patient_trends(patient_id: str, tests: Optional[str] = None):
+    """Time series and summary statistics per test, e.g. ?tests=Hemoglobin,TLC"""
+    if history is None:
+        raise HTTPException(status_code=404, detail="Patient history is disabled")
+    wanted = [t.strip() for t in tests.split(",") if t.strip()] if tests else None
+    trends = await run_in_threadpool(history.trends, patient_id, wanted)
+    return {"patient_id": patient_id, "trends": trends}
+
+class ReclassifyRequest(BaseModel):
+    tests: List[str]
+    values: List[float]
+    report_ids: Optional[List[str]] = None
+    ranges: Dict[str, Tuple[float, float]] = {}
+
+class RangeUpdate(BaseModel):
+    ranges: Dict[str, Tuple[float, float]]
+
+@app.post("/reclassify")
+async def reclassify_results(body: ReclassifyRequest):
+    """Bulk Low/Normal/High re-evaluation of columnar (test, value) arrays"""
+    if len(body.tests) != len(body.values) or (body.report_ids is not None and len(body.report_ids) != len(body.tests)):
+        raise HTTPException(status_code=422, detail="tests, values and report_ids must have the same length")
+    return await run_in_threadpool(
+        reclassify, body.tests, body.values, body.report_ids, ranges_from(body.ranges.items()))
+
+@app.post("/history/reclassify")
+async def reclassify_history(body: RangeUpdate):
+    """Re-flag the stored results of the given tests against these ranges (not saved as the rules' ranges)"""
+    if history is None:
+        raise HTTPException(status_code=404, detail="Patient history is disabled")
+    return await run_in_threadpool(history.reclassify, body.ranges)
+
+@app.on_event("startup")
+async def start_ocr_warm_up():
+    if settings.OCR_WARMUP_ON_STARTUP:
+        # background task: the app answers /health/live while the model loads
+        app.state.ocr_warm_up = asyncio.create_task(ocr_pool.warm_up())
+
+@app.on_event("shutdown")
+def shutdown_ocr_pool():
+    ocr_pool.close()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Stage timings, sizes, page and cache counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -375,4 +421,20 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
\ No newline at end of file
+    return {"status": "healthy", "ocr_model": ocr_pool.state, "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving; says nothing about the OCR model"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/ready")
+async def readiness():
+    """Ready for OCR traffic only once the worker model is warm"""
+    state = ocr_pool.state
+    body = {"status": "ready" if state == "ready" else "not_ready",
+            "ocr_model": state,
+            "timestamp": datetime.now().isoformat()}
+    if ocr_pool.error:
+        body["error"] = ocr_pool.error
+    return JSONResponse(status_code=200 if state == "ready" else 503, content=body)
\ No newline at end of file
@@ -0,0 +1,187 @@
+# backend/metrics.py
+"""
+In-process counters and histograms, rendered in the Prometheus text format
+on ``GET /metrics``.
+
+Stages are timed with ``span("stage")``.  OCR runs in pool worker processes,
+whose registries nobody scrapes: there, ``ocr_pool`` wraps each job in
+``capture()``.  Observations made during the job are buffered instead of
+applied, sent back with the job's result, and ``replay``-ed into the API
+process's registry.
+"""
+import bisect
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import settings
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]      # (metric name, labels, value)
+
+_lock = threading.Lock()
+_registry: Dict[str, "_Metric"] = {}
+_sink: Optional[List[Sample]] = None    # set while a worker job is captured
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        _registry[name] = self
+
+    def _record(self, labels: Dict[str, str], value: float) -> None:
+        sample = (self.name, tuple(sorted(labels.items())), value)
+        with _lock:
+            if _sink is not None:
+                _sink.append(sample)
+            else:
+                self._apply(sample[1], value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._record(labels, amount)
+
+    def _apply(self, labels: Labels, value: float) -> None:
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_fmt(labels)} {_num(v)}" for labels, v in sorted(self.values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float]):
+        super().__init__(name, help)
+        self.buckets = sorted(buckets)
+        self.series: Dict[Labels, list] = {}     # labels → [bucket counts…, sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        self._record(labels, value)
+
+    def _apply(self, labels: Labels, value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, series in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_fmt(labels + (('le', _num(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_fmt(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_fmt(labels)} {_num(series[-2])}")
+            lines.append(f"{self.name}_count{_fmt(labels)} {series[-1]}")
+        return lines
+
+
+def _fmt(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# ───────────────────────────  Metrics  ───────────────────────────
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES = tuple(16 * 1024 * 4 ** i for i in range(8))             # 16 KiB … 256 MiB
+
+STAGE_SECONDS = Histogram(
+    "healthscan_stage_seconds",
+    "Time spent per pipeline stage (upload_read, pdf_text, rasterize, preprocess, ocr_page, analysis, insights)",
+    SECONDS,
+)
+UPLOAD_SECONDS = Histogram("healthscan_upload_seconds", "End-to-end /upload handling time", SECONDS)
+UPLOAD_BYTES = Histogram("healthscan_upload_bytes", "Size of uploaded files", BYTES)
+PAGES = Counter("healthscan_pages_total", "Pages processed, by how their text was obtained")
+OCR_FALLBACKS = Counter(
+    "healthscan_ocr_fallbacks_total", "PDF pages without enough selectable text that were OCR'd"
+)
+PAGES_SKIPPED = Counter(
+    "healthscan_pages_skipped_total", "Scanned PDF pages not OCR'd, by reason (panel_complete, page_budget)"
+)
+EXTRACTION_FAILURES = Counter("healthscan_extraction_failures_total", "Files no text could be extracted from")
+CACHE_LOOKUPS = Counter("healthscan_cache_lookups_total", "Result cache lookups by outcome")
+OCR_BACKEND_SECONDS = Histogram(
+    "healthscan_ocr_backend_seconds", "Time one OCR backend spent reading one page", SECONDS
+)
+OCR_BACKEND_CONFIDENCE = Histogram(
+    "healthscan_ocr_backend_confidence", "Mean word confidence of a page reading, by backend",
+    (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0),
+)
+OCR_BACKEND_PAGES = Counter("healthscan_ocr_backend_pages_total", "OCR'd pages whose text came from each backend")
+OCR_ESCALATIONS = Counter(
+    "healthscan_ocr_escalations_total", "Pages passed on to the next OCR backend, by backend and reason (confidence, tests)"
+)
+OCR_BACKEND_UNAVAILABLE = Counter(
+    "healthscan_ocr_backend_unavailable_total", "Configured OCR backends that failed to load"
+)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block into ``healthscan_stage_seconds{stage=...}``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+@contextmanager
+def capture():
+    """Buffer this process's observations into the yielded list instead of applying them."""
+    global _sink
+    samples: List[Sample] = []
+    with _lock:
+        _sink = samples
+    try:
+        yield samples
+    finally:
+        with _lock:
+            _sink = None
+
+
+def replay(samples: Sequence[Sample]) -> None:
+    """Apply observations captured in another process."""
+    with _lock:
+        for name, labels, value in samples:
+            _registry[name]._apply(labels, value)
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        for metric in _registry.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def sampled() -> bool:
+    """Whether to log this upload: opt in with HEALTHSCAN_LOG_SAMPLE_RATE (0 → never)."""
+    rate = settings.LOG_SAMPLE_RATE
+    return rate > 0 and (rate >= 1 or random.random() < rate)
@@ -1,82 +1,294 @@
-# ocr.py  🔍  DEBUG-ENABLED
+# ocr.py  🔍
 from pathlib import Path
-import io, mimetypes, traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+import mimetypes, threading, time, traceback
 
 import fitz               # ← requires *PyMuPDF* (pip install pymupdf)
-import easyocr            # pip install easyocr
-from PIL import Image      # pillow
-from pdf2image import convert_from_bytes  # pip install pdf2image poppler-utils
+
+import layout
+import metrics
+import ocr_backends
+import preprocess
+import settings
+from extractor import PanelTracker
+from parser import Row, rows_from_text
+from rules import registry
 
 # ──────────────────────────────────────────────────────────────
-#  Initialise EasyOCR once (GPU optional)
+#  The OCR backends (see ocr_backends.py) are loaded lazily, once per
+#  process.  Importing this module stays cheap; call warm_up() to load
+#  ahead of time.
 # ──────────────────────────────────────────────────────────────
-reader = easyocr.Reader(["en"], gpu=False)
+_reader = None
+_reader_lock = threading.Lock()
+_model_state = "cold"           # cold → loading → ready | failed
+
+
+def get_reader() -> ocr_backends.TieredReader:
+    global _reader, _model_state
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _model_state = "loading"
+                try:
+                    _reader = ocr_backends.TieredReader(ocr_backends.load(settings.OCR_BACKENDS))
+                except Exception:
+                    _model_state = "failed"
+                    raise
+                _model_state = "ready"
+    return _reader
+
+
+_page_slots = None
+_page_slots_lock = threading.Lock()
+
+
+def read_page(image) -> str:
+    """
+    OCR one page image.  At most ``OCR_CONCURRENT_PAGES`` pages are read at
+    once in this process, across all requests (0: no limit).
+    """
+    global _page_slots
+    if not settings.OCR_CONCURRENT_PAGES:
+        return get_reader().read(image).text
+    if _page_slots is None:
+        with _page_slots_lock:
+            if _page_slots is None:
+                _page_slots = threading.BoundedSemaphore(settings.OCR_CONCURRENT_PAGES)
+    with _page_slots:
+        return get_reader().read(image).text
+
+
+def warm_up() -> str:
+    """Load the OCR backends now rather than on the first scanned upload."""
+    get_reader()
+    return _model_state
+
+
+def model_state() -> str:
+    return _model_state
 
 
 # ──────────────────────────  Helper extractors  ──────────────────────────
-def _text_from_pdf_bytes(raw: bytes) -> str:
-    text_chunks = []
-    with fitz.open(stream=raw, filetype="pdf") as doc:
-        for page in doc:
-            text_chunks.append(page.get_text())
-    return "\n".join(text_chunks)
+# Uploads arrive either as bytes or as the path of a spooled temp file; a path
+# lets MuPDF and the image decoder read from disk instead of a copy in memory.
+Source = Union[bytes, str]
+
+
+def _open_pdf(raw: Source) -> "fitz.Document":
+    if isinstance(raw, str):
+        return fitz.open(raw, filetype="pdf")
+    return fitz.open(stream=raw, filetype="pdf")
+
+
+SCAN_DPI = 250
+
+
+def _iter_ocr_pages(doc: "fitz.Document", indices) -> Iterator[Tuple[int, str]]:
+    """
+    OCR the given pages of an open document, yielding ``(page index, text)``
+    in page order as each one is done.  Up to ``OCR_PAGE_THREADS`` pages are
+    worked on ahead of the consumer; pages are rendered lazily inside the
+    worker that OCRs them, so at most that many rasters are alive at once.
+    Closing the generator early skips every page not yet started.
+    """
+    render_lock = threading.Lock()    # MuPDF documents are not thread-safe
+    stopped = threading.Event()
+
+    def ocr_page(index: int) -> Optional[str]:
+        if stopped.is_set():
+            return None
+        with metrics.span("rasterize"):
+            with render_lock:
+                page = doc[index]
+            try:
+                if settings.OCR_PREPROCESS:
+                    pixels = preprocess.page_pixels(page, SCAN_DPI, render_lock)
+                else:
+                    with render_lock:
+                        pixels = preprocess.render_gray(page, SCAN_DPI)
+            finally:
+                with render_lock:
+                    del page        # freeing it is a MuPDF call too
+        with metrics.span("ocr_page"):
+            text = read_page(pixels)
+        metrics.PAGES.inc(source="ocr")
+        return text
+
+    pool = ThreadPoolExecutor(max_workers=settings.OCR_PAGE_THREADS)
+    try:
+        todo = iter(indices)
+        ahead = deque((i, pool.submit(ocr_page, i)) for i in islice(todo, settings.OCR_PAGE_THREADS))
+        while ahead:
+            index, future = ahead.popleft()
+            text = future.result()
+            for i in islice(todo, 1):
+                ahead.append((i, pool.submit(ocr_page, i)))
+            yield index, text
+    finally:
+        # pages already being OCR'd finish (the document must stay open for them)
+        stopped.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _needs_ocr(page_text: str) -> bool:
+    return sum(not c.isspace() for c in page_text) < settings.PDF_MIN_PAGE_CHARS
+
+
+class Extraction(NamedTuple):
+    text: str
+    pages: int                      # pages in the document (1 for an image)
+    ocr_pages: List[int]            # 1-based page numbers that went through OCR
+    skipped_pages: List[int]        # 1-based page numbers that needed OCR but were skipped
+    stopped_early: Optional[str]    # "panel_complete" | "page_budget" | None
+    rows: Optional[List[Row]] = None    # table rows, when extracted with ``layout``
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "total": self.pages,
+            "ocr": self.ocr_pages,
+            "skipped": self.skipped_pages,
+            "stopped_early": self.stopped_early,
+        }
 
 
-def _text_from_scanned_pdf(raw: bytes) -> str:
-    pages = convert_from_bytes(raw, dpi=250)
-    results = []
-    for img in pages:
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        results.extend(reader.readtext(buf.getvalue(), detail=0))
-    return "\n".join(results)
+def _emit(progress, event: str, **data: Any) -> None:
+    """Report a stage to whoever streams this extraction (a queue, possibly a Manager proxy)."""
+    if progress is not None:
+        progress.put({"event": event, **data})
 
 
-def _text_from_image(raw: bytes) -> str:
-    return "\n".join(reader.readtext(raw, detail=0))
+def _extract_pdf(raw: Source, tracker: Optional[PanelTracker] = None, page_budget: int = 0,
+                 progress=None, with_layout: bool = False) -> Extraction:
+    """
+    Triage a PDF page by page: keep selectable text where a page has enough
+    of it, rasterise + OCR only the pages that do not.
+
+    Pages are analysed in order as their text arrives.  Once ``tracker``
+    reports every detected panel complete, or ``page_budget`` pages have
+    been OCR'd, the remaining scanned pages are skipped.  Selectable-text
+    pages cost nothing and are always kept.
+
+    With ``progress``, a ``document`` event follows the triage and a
+    ``page`` event (with that page's final text) follows every page, in
+    order, as soon as it is done.
+
+    ``with_layout`` also returns the result rows: rebuilt from word boxes
+    (``layout.py``) on selectable pages, read from the page text as the
+    ``auto`` parser would on scanned pages and on pages where the word boxes
+    give no rows.
+    """
+    with _open_pdf(raw) as doc:
+        with metrics.span("pdf_text"):
+            if with_layout:
+                pages, rows = [], []
+                for page in doc:
+                    textpage = page.get_textpage()      # parsed once for both
+                    pages.append(page.get_text(textpage=textpage))
+                    rows.append(layout.page_rows(page, textpage) or rows_from_text(pages[-1]))
+            else:
+                pages, rows = [page.get_text() for page in doc], None
+        scanned = [i for i, text in enumerate(pages) if _needs_ocr(text)]
+        metrics.PAGES.inc(len(pages) - len(scanned), source="text")
+        if scanned:
+            metrics.OCR_FALLBACKS.inc(len(scanned))
+        _emit(progress, "document", pages=len(pages), scanned=len(scanned))
+
+        to_ocr = set(scanned[:page_budget] if page_budget else scanned)
+        ocr_done, skipped, reason = [], [], None
+        complete = False
+        results = _iter_ocr_pages(doc, sorted(to_ocr))
+        try:
+            for i, text in enumerate(pages):
+                source = "text"
+                if i in to_ocr and not complete:
+                    _, ocr_text = next(results)
+                    # keep whatever little selectable text there was (headers, stamps)
+                    pages[i] = "\n".join(t for t in (text.strip(), ocr_text) if t)
+                    ocr_done.append(i + 1)
+                    source = "ocr"
+                    if rows is not None:
+                        rows[i] = rows_from_text(pages[i])
+                elif _needs_ocr(text):
+                    why = "panel_complete" if complete else "page_budget"
+                    skipped.append(i + 1)
+                    reason = reason or why
+                    metrics.PAGES_SKIPPED.inc(reason=why)
+                    source = "skipped"
+                _emit(progress, "page", page=i + 1, pages=len(pages), source=source, text=pages[i])
+                if tracker is not None and not complete:
+                    complete = tracker.feed(pages[i])
+        finally:
+            results.close()
+    if rows is not None:
+        rows = [row for page_rows in rows for row in page_rows]
+    return Extraction("\n".join(pages), len(pages), ocr_done, skipped, reason, rows)
+
+
+def _text_from_image(raw: Source) -> str:
+    if settings.OCR_PREPROCESS:
+        with metrics.span("preprocess"):
+            raw = preprocess.image_pixels(raw)
+    with metrics.span("ocr_page"):
+        text = read_page(raw)
+    metrics.PAGES.inc(source="ocr")
+    return text
 
 
 # ────────────────────────────  Public API  ───────────────────────────────
-def extract_text_from_file(filename: str, raw: bytes) -> str:
+def extract_report(filename: str, raw: Source, early_stop: Optional[bool] = None,
+                   progress=None, with_layout: bool = False) -> Extraction:
     """
     Decide which extractor to call based on extension / MIME type.
     Called from FastAPI router.
+
+    ``early_stop`` (default ``OCR_EARLY_STOP``) lets a multi-page PDF stop
+    OCR once the panels found so far are complete; ``OCR_PAGE_BUDGET``
+    caps OCR'd pages either way.  ``progress`` receives stage events as
+    they happen (see ``_extract_pdf``; an image is one page).
+    ``with_layout`` adds the table rows of a PDF (images have none).
+
+    Report text never goes to stdout; a one-line summary is printed for a
+    sample of files when HEALTHSCAN_LOG_SAMPLE_RATE is set.
     """
     ext  = Path(filename).suffix.lower()
     mime, _ = mimetypes.guess_type(filename)
-
-    print(f"\n📥  Received: {filename}  |  ext={ext}  mime={mime}")
+    start = time.perf_counter()
 
     # ───── PDF ───────────────────────────────────────────────────────────
     if ext == ".pdf" or (mime and mime.startswith("application/pdf")):
-        # Try selectable text first
-        try:
-            selectable = _text_from_pdf_bytes(raw)
-            if selectable.strip():
-                print("✅  Selectable text extracted (preview):", selectable[:200], "…")
-                return selectable
-            else:
-                print("ℹ️  PDF has no selectable text, falling back to OCR …")
-        except Exception as e:
-            print("❌  Selectable-text extraction failed:")
-            traceback.print_exc()
-
-        # Fallback: rasterise + OCR
+        # Selectable text where the page has it, OCR where it does not
+        if settings.OCR_EARLY_STOP if early_stop is None else early_stop:
+            tracker = PanelTracker(registry.rules.panels)
+        else:
+            tracker = None
         try:
-            ocr_text = _text_from_scanned_pdf(raw)
-            print("✅  OCR from scanned PDF succeeded (preview):", ocr_text[:200], "…")
-            return ocr_text
+            extraction = _extract_pdf(raw, tracker, settings.OCR_PAGE_BUDGET, progress, with_layout)
         except Exception:
-            print("❌  OCR on scanned PDF failed:")
+            metrics.EXTRACTION_FAILURES.inc(kind="pdf")
+            print("❌  PDF extraction failed:")
             traceback.print_exc()
-            return ""
+            return Extraction("", 0, [], [], None)
+        if metrics.sampled():
+            print(f"✅  PDF: {len(extraction.text)} chars, {extraction.pages} page(s), "
+                  f"{len(extraction.ocr_pages)} via OCR, {len(extraction.skipped_pages)} skipped, "
+                  f"{(time.perf_counter() - start) * 1e3:.0f} ms")
+        return extraction
 
     # ───── Image (PNG / JPG / …) ─────────────────────────────────────────
+    _emit(progress, "document", pages=1, scanned=1)
     try:
         img_text = _text_from_image(raw)
-        print("✅  Image OCR output (preview):", img_text[:200], "…")
-        return img_text
     except Exception:
+        metrics.EXTRACTION_FAILURES.inc(kind="image")
         print("❌  Image OCR failed:")
         traceback.print_exc()
-        return ""
+        return Extraction("", 1, [], [], None)
+    if metrics.sampled():
+        print(f"✅  Image ({ext or mime}): {len(img_text)} chars, "
+              f"{(time.perf_counter() - start) * 1e3:.0f} ms")
+    _emit(progress, "page", page=1, pages=1, source="ocr", text=img_text)
+    return Extraction(img_text, 1, [1], [], None)
@@ -0,0 +1,185 @@
+# backend/ocr_backends.py
+"""
+OCR engines behind one interface, and the tiered reader that chooses between
+them.
+
+``OCR_BACKENDS`` lists the engines fastest first (default Tesseract, then
+EasyOCR).  Each page is read by the first engine; it moves on to the next
+one only when the reading looks poor, i.e. its mean word confidence is below
+``OCR_ESCALATE_CONFIDENCE``, or it yields fewer than
+``OCR_ESCALATE_MIN_TESTS`` lab tests *and* its confidence is only marginal
+(below ``OCR_ESCALATE_TESTS_BELOW_CONFIDENCE``, or unknown): a cleanly read
+page without results is a cover or disclaimer page, not a misread table.
+Of all readings made for a page, the one with the most tests is kept, the
+later (slower, more accurate) engine winning ties.
+
+An engine that cannot be loaded (package or binary missing) is left out with
+a warning, so the default list degrades to EasyOCR alone where Tesseract is
+not installed.  ``stub`` needs nothing and lets the server run without any
+OCR engine: it reads every page as empty (so scanned uploads answer "No text
+could be extracted" rather than results nobody measured); the benchmarks
+give it their own report text.
+"""
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+import metrics
+import preprocess
+import settings
+from extractor import extractor
+from parser import iter_lab_rows
+
+Image_ = Union[np.ndarray, bytes, str]     # pixels, encoded file, or file path
+
+
+class Reading(NamedTuple):
+    text: str
+    confidence: Optional[float]     # mean word confidence in [0, 1]; None if the engine gives none
+
+
+class OCRBackend:
+    """One OCR engine.  ``load`` may be slow; ``read`` is called from several threads."""
+
+    name = ""
+
+    def load(self) -> None:
+        pass
+
+    def read(self, image: Image_) -> Reading:
+        raise NotImplementedError
+
+
+class EasyOCRBackend(OCRBackend):
+    name = "easyocr"
+
+    def __init__(self):
+        self.reader = None
+
+    def load(self) -> None:
+        import easyocr            # pip install easyocr
+        self.reader = easyocr.Reader(["en"], gpu=False)
+
+    def read(self, image: Image_) -> Reading:
+        results = self.reader.readtext(image)       # [(box, text, confidence), …]
+        if not results:
+            return Reading("", None)
+        return Reading(
+            "\n".join(text for _, text, _ in results),
+            sum(float(conf) for _, _, conf in results) / len(results),
+        )
+
+
+class TesseractBackend(OCRBackend):
+    name = "tesseract"
+    # one uniform block of text: keeps a table row on one line
+    config = "--psm 6"
+
+    def __init__(self):
+        self.pytesseract = None
+
+    def load(self) -> None:
+        import pytesseract        # pip install pytesseract (and the tesseract binary)
+        pytesseract.get_tesseract_version()     # raises when the binary is missing
+        self.pytesseract = pytesseract
+
+    def read(self, image: Image_) -> Reading:
+        pixels = image if isinstance(image, np.ndarray) else preprocess.decode(image)
+        data = self.pytesseract.image_to_data(
+            Image.fromarray(pixels), config=self.config, output_type=self.pytesseract.Output.DICT
+        )
+        lines: Dict[Tuple[int, int, int], List[str]] = {}
+        confidences = []
+        for word, conf, block, par, line in zip(
+            data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]
+        ):
+            if not word.strip():
+                continue
+            lines.setdefault((block, par, line), []).append(word)
+            if float(conf) >= 0:
+                confidences.append(float(conf) / 100)
+        text = "\n".join(" ".join(words) for words in lines.values())
+        return Reading(text, sum(confidences) / len(confidences) if confidences else None)
+
+
+class StubBackend(OCRBackend):
+    """Fixed text for every page (none by default); for running without an OCR engine."""
+
+    name = "stub"
+
+    def __init__(self, lines: Sequence[str] = (), confidence: Optional[float] = 1.0):
+        self.lines = list(lines)
+        self.confidence = confidence
+
+    def read(self, image: Image_) -> Reading:
+        return Reading("\n".join(self.lines), self.confidence)
+
+
+BACKENDS = {b.name: b for b in (EasyOCRBackend, TesseractBackend, StubBackend)}
+
+
+def tests_found(text: str) -> int:
+    """Lab tests ``analyze_medical_report`` would find: CBC patterns, else table rows."""
+    return len(extractor.find(text)) or sum(1 for _ in iter_lab_rows(text))
+
+
+def load(names: Sequence[str]) -> List[OCRBackend]:
+    """Instantiate and load the named engines, dropping those that fail to load."""
+    unknown = [n for n in names if n not in BACKENDS]
+    if unknown:
+        raise ValueError(f"unknown OCR backend(s) {', '.join(unknown)}; choose from {', '.join(BACKENDS)}")
+    loaded, error = [], None
+    for name in names:
+        backend = BACKENDS[name]()
+        try:
+            backend.load()
+        except Exception as e:
+            print(f"⚠️  OCR backend {name} unavailable: {e}")
+            metrics.OCR_BACKEND_UNAVAILABLE.inc(backend=name)
+            error = e
+            continue
+        loaded.append(backend)
+    if not loaded:
+        raise RuntimeError(f"no OCR backend could be loaded (last error: {error})")
+    return loaded
+
+
+class TieredReader:
+    """Reads a page with the fastest backend and escalates poor readings (see module docstring)."""
+
+    def __init__(self, backends: Sequence[OCRBackend],
+                 min_confidence: Optional[float] = None, min_tests: Optional[int] = None,
+                 tests_below_confidence: Optional[float] = None):
+        self.backends = list(backends)
+        self.min_confidence = settings.OCR_ESCALATE_CONFIDENCE if min_confidence is None else min_confidence
+        self.min_tests = settings.OCR_ESCALATE_MIN_TESTS if min_tests is None else min_tests
+        self.tests_below_confidence = (settings.OCR_ESCALATE_TESTS_BELOW_CONFIDENCE
+                                       if tests_below_confidence is None else tests_below_confidence)
+
+    def _poor(self, reading: Reading, tests: int) -> Optional[str]:
+        confidence = reading.confidence
+        if confidence is not None and confidence < self.min_confidence:
+            return "confidence"
+        if tests < self.min_tests and (confidence is None or confidence < self.tests_below_confidence):
+            return "tests"
+        return None
+
+    def read(self, image: Image_) -> Reading:
+        best, best_tests, used = None, -1, ""
+        for tier, backend in enumerate(self.backends):
+            start = time.perf_counter()
+            reading = backend.read(image)
+            metrics.OCR_BACKEND_SECONDS.observe(time.perf_counter() - start, backend=backend.name)
+            if reading.confidence is not None:
+                metrics.OCR_BACKEND_CONFIDENCE.observe(reading.confidence, backend=backend.name)
+            tests = tests_found(reading.text)
+            if tests >= best_tests:
+                best, best_tests, used = reading, tests, backend.name
+            reason = self._poor(reading, tests)
+            if reason is None or tier == len(self.backends) - 1:
+                break
+            metrics.OCR_ESCALATIONS.inc(backend=backend.name, reason=reason)
+        metrics.OCR_BACKEND_PAGES.inc(backend=used)
+        return best
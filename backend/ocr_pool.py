@@ -0,0 +1,191 @@
+# backend/ocr_pool.py
+"""
+Bounded process pool for OCR / PDF extraction.
+
+Each worker loads the OCR backends once in its initializer (when
+``OCR_PRELOAD`` is on, otherwise on its first scanned page) and reuses it for
+every job it runs.  Workers split the cores: torch and BLAS in each are
+capped so that ``workers × OCR_PAGE_THREADS`` concurrent pages do not each
+start a thread per core.  The pool admits at
+most ``workers + queue_depth`` jobs; past that ``submit`` raises
+``PoolSaturated`` immediately so the API can answer 503 instead of letting
+uploads pile up in memory.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+import settings
+
+
+class PoolSaturated(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("OCR workers are busy, retry later")
+        self.retry_after = retry_after
+
+
+_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+
+
+def torch_threads(processes: int) -> int:
+    """
+    torch / BLAS threads for each page being OCR'd, when ``processes``
+    processes share the cores and each OCRs up to ``OCR_PAGE_THREADS``
+    pages at a time.
+    """
+    return max(1, (os.cpu_count() or 1) // (processes * settings.OCR_PAGE_THREADS))
+
+
+def pin_threads(threads: int) -> None:
+    """Cap OpenMP / BLAS (read from the environment when they load) and torch, if loaded."""
+    for var in _THREAD_VARS:
+        os.environ[var] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _init_worker(preload: bool, threads: int) -> None:
+    # before ``import ocr``: numpy and torch read the limits when they load
+    pin_threads(threads)
+    import ocr
+    if preload:
+        ocr.warm_up()
+
+
+def _measured(fn: Callable[..., Any], *args: Any) -> tuple:
+    """
+    Run ``fn`` in a worker and ship its metric observations back with the
+    result, along with whether this worker now has its model loaded.
+    """
+    with metrics.capture() as samples:
+        result = fn(*args)
+    ocr = sys.modules.get("ocr")
+    return result, samples, ocr is not None and ocr.model_state() == "ready"
+
+
+class OCRPool:
+    def __init__(self, workers: int, queue_depth: int, retry_after: int):
+        self.workers = workers
+        self.capacity = workers + queue_depth if workers else queue_depth
+        self.retry_after = retry_after
+        self.pending = 0
+        self._state = "cold"            # cold → warming → ready | failed (worker processes)
+        self.error: Optional[str] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: torch's thread pools do not survive a fork.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(settings.OCR_PRELOAD, torch_threads(self.workers)),
+            )
+        return self._executor
+
+    @property
+    def state(self) -> str:
+        """
+        ``ready`` once the model is loaded: in this process when jobs run
+        here, otherwise in at least one live worker (after warm-up, or after
+        a job that loaded it lazily).  A replaced pool starts ``cold`` again.
+        """
+        if not self.workers:
+            import ocr
+            state = ocr.model_state()
+            return "warming" if state == "loading" else state
+        return self._state
+
+    def progress_queue(self):
+        """
+        A queue a job can report progress on: a plain queue when jobs run in
+        this process, otherwise a proxy served by a (lazily started) manager
+        process that worker processes can reach.
+        """
+        if not self.workers:
+            return queue.Queue()
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager.Queue()
+
+    async def submit(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)`` on a worker, or raise ``PoolSaturated``."""
+        if self.pending >= self.capacity:
+            raise PoolSaturated(self.retry_after)
+        self.pending += 1
+        try:
+            if not self.workers:
+                return await run_in_threadpool(fn, *args)
+            loop = asyncio.get_running_loop()
+            result, samples, model_ready = await loop.run_in_executor(
+                self._get_executor(), _measured, fn, *args
+            )
+            metrics.replay(samples)
+            if model_ready:
+                self._state, self.error = "ready", None
+            return result
+        except BrokenProcessPool:
+            # A worker died (OOM-killed, segfault in a native lib …).  Drop the
+            # pool so the next job starts fresh ones, cold until proven otherwise.
+            self.shutdown()
+            self._state = "cold"
+            if settings.OCR_WARMUP_ON_STARTUP:
+                asyncio.ensure_future(self.warm_up())
+            raise
+        finally:
+            self.pending -= 1
+
+    async def warm_up(self) -> None:
+        """
+        Start the workers and load the model before traffic arrives.  The pool
+        is ``ready`` once every warm-up call has returned, i.e. at least one
+        worker has its model loaded (the others load in their initializers).
+        """
+        import ocr
+
+        self._state = "warming"
+        try:
+            if not self.workers:
+                await run_in_threadpool(ocr.warm_up)
+            else:
+                loop = asyncio.get_running_loop()
+                executor = self._get_executor()
+                await asyncio.gather(*[
+                    loop.run_in_executor(executor, ocr.warm_up) for _ in range(self.workers)
+                ])
+        except Exception as e:
+            self._state, self.error = "failed", str(e)
+            return
+        self._state, self.error = "ready", None
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def close(self) -> None:
+        """Shut down for good (app exit): workers and the progress manager."""
+        self.shutdown()
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+def build_pool() -> OCRPool:
+    return OCRPool(
+        settings.OCR_WORKERS, settings.OCR_QUEUE_DEPTH, settings.OCR_RETRY_AFTER_SECONDS
+    )
@@ -1,8 +1,11 @@
 # backend/parser.py
 import re
-from typing import List, Optional
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Union
 from pydantic import BaseModel
 
+from extractor import extractor
+from rules import registry
+
 class LabRow(BaseModel):
     name: str
     value: float
@@ -14,33 +17,126 @@ class LabRow(BaseModel):
 class Report(BaseModel):
     rows: List[LabRow]
 
-RANGES = {
-    "HbA1c": ("%",       4.0,  5.6),
-    "LDL":   ("mg/dL",   0,    130),
-    "WBC":   ("10^3/uL", 4.0,  11.0),
-    # ▸ add more ranges here …
+class Row(NamedTuple):
+    """Lightweight row yielded by the streaming parser; validated into LabRow only at the edge"""
+    name: str
+    value: float
+    unit: str
+    ref_low: Optional[float]
+    ref_high: Optional[float]
+    status: str
+
+# Unit to report when the row prints none; reference ranges are in rules.json
+UNITS = {
+    "HbA1c": "%",
+    "LDL":   "mg/dL",
+    "WBC":   "10^3/uL",
+    # ▸ add more units here …
 }
 
+# ① single-line “table” rows:  NAME  VALUE  UNIT  (easy)
+TABLE_ROW = re.compile(r"(\w[\w\s/%+-]+?)\s{2,}([\d.,]+)\s{2,}([^\s]+)")
+
+
 def parse_lab_text(text: str) -> Report:
-    rows: list[LabRow] = []
+    return Report(rows=[LabRow(**row._asdict()) for row in iter_lab_rows(text)])
+
 
-    # ① single-line “table” rows:  NAME  VALUE  UNIT  (easy)
-    table_pattern = re.compile(r"^(\w[\w\s/%+-]+?)\s{2,}([\d.,]+)\s{2,}([^\s]+)", re.M)
+def iter_lab_rows(text: Union[str, Iterable[str]]) -> Iterator[Row]:
+    """
+    Stream rows out of ``text`` — a string, or an iterable of chunks (e.g.
+    pages as OCR finishes them).  Table rows are yielded as soon as their
+    line is complete.  Triplet rows (name / value / unit on separate lines)
+    are only a fallback for reports without any table row, so they are held
+    back until the end and dropped the moment a table row shows up.
+    """
+    chunks = [text] if isinstance(text, str) else text
+    triplets: Optional[List[Row]] = []    # None once a table row was seen
+    window: List[str] = []                # last non-empty lines, for ②
 
-    for name, value_raw, unit in table_pattern.findall(text):
-        rows.append(_make_row(name.strip(), value_raw, unit))
+    for line in _iter_lines(chunks):
+        match = TABLE_ROW.match(line)
+        if match and _is_number(match.group(2)):
+            triplets = None
+            name, value_raw, unit = match.groups()
+            yield _make_row(name.strip(), value_raw, unit)
+            continue
+        if triplets is None:
+            continue
 
-    # ② fallback — triplets on separate lines
-    if not rows:
-        lines = [l.strip() for l in text.splitlines() if l.strip()]
-        for i in range(len(lines) - 2):
-            name, value_raw, unit = lines[i : i + 3]
+        # ② fallback — triplets on separate lines
+        line = line.strip()
+        if not line:
+            continue
+        window.append(line)
+        if len(window) == 3:
+            name, value_raw, unit = window
             if _is_number(value_raw):
-                rows.append(_make_row(name, value_raw, unit))
-                i += 2
+                triplets.append(_make_row(name, value_raw, unit))
+                window.clear()          # consume the whole triplet
+            else:
+                del window[0]
+
+    if triplets:
+        yield from triplets
+
+
+def cbc_rows(text: str):
+    """(test, value, unit, min, max, range) for the hard-coded CBC patterns"""
+    ranges = registry.rules.ranges
+    # Comprehensive test patterns for CBC reports (see extractor.TEST_PATTERNS)
+    for (_, test_name, unit), match in extractor.find(text):
+        value = float(match.group(1))
+        min_normal, max_normal = ranges.get(test_name, (None, None))
+        
+        # Extract reference range if available, otherwise use defaults
+        ref_range = f"{min_normal}-{max_normal}"
+        if len(match.groups()) >= 3 and match.group(2) and match.group(3):
+            ref_range = f"{match.group(2)}-{match.group(3)}"
+        
+        yield test_name, value, unit, min_normal, max_normal, ref_range
+
+
+def table_rows(text: str):
+    """Same rows from the generic table parser (any layout, ranges may be unknown)"""
+    for row in iter_lab_rows(text):
+        known = row.ref_low is not None and row.ref_high is not None
+        ref_range = f"{row.ref_low}-{row.ref_high}" if known else ""
+        yield row.name, row.value, row.unit, row.ref_low, row.ref_high, ref_range
+
+
+def auto_rows(text: str):
+    """CBC patterns first; the generic table parser only when they find nothing"""
+    found = False
+    for row in cbc_rows(text):
+        found = True
+        yield row
+    if not found:
+        yield from table_rows(text)
+
+
+def rows_from_text(text: str) -> List[Row]:
+    """``auto_rows`` as layout rows, for pages whose word boxes give none (scanned, single-spaced)"""
+    rows = []
+    for test_name, value, unit, min_normal, max_normal, _ in auto_rows(text):
+        status = "normal"
+        if min_normal is not None and value < min_normal:
+            status = "low"
+        elif max_normal is not None and value > max_normal:
+            status = "high"
+        rows.append(Row(test_name, value, unit, min_normal, max_normal, status))
+    return rows
 
-    return Report(rows=rows)
 
+def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split a stream of text chunks into lines, carrying partial lines over."""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        yield from lines
+    if pending:
+        yield pending
 
 
 def _is_number(s: str) -> bool:
@@ -50,9 +146,12 @@ def _is_number(s: str) -> bool:
     except ValueError:
         return False
 
-def _make_row(name: str, value_raw: str, unit_in_text: str) -> LabRow:
+def _make_row(name: str, value_raw: str, unit_in_text: str) -> Row:
     value = float(value_raw.replace(",", ""))
-    unit_ref, low, high = RANGES.get(name, (unit_in_text, None, None))
+    rules = registry.rules
+    name = rules.canonical(name) or name
+    unit_ref = UNITS.get(name)
+    low, high = rules.ranges.get(name, (None, None))
 
     status = "normal"
     if low is not None and value < low:
@@ -60,11 +159,4 @@ def _make_row(name: str, value_raw: str, unit_in_text: str) -> LabRow:
     elif high is not None and value > high:
         status = "high"
 
-    return LabRow(
-        name=name,
-        value=value,
-        unit=unit_ref or unit_in_text,
-        ref_low=low,
-        ref_high=high,
-        status=status,
-    )
+    return Row(name, value, unit_ref or unit_in_text, low, high, status)
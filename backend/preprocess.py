@@ -0,0 +1,257 @@
+# backend/preprocess.py
+"""
+Image preparation in front of OCR.
+
+OCR time grows with pixel count, and what matters to the model is how tall
+the text is in pixels, not the file's resolution.  Every page is therefore
+looked at once at low resolution first, to measure
+
+* the skew of the text lines (projection-profile search),
+* the height of a text line, and
+* the bounding box of the printed content.
+
+The page is then produced at the resolution that puts text lines at
+``OCR_TARGET_LINE_PX`` (images are only enlarged when their text is below
+``OCR_MIN_LINE_PX``), in grayscale, deskewed and cropped to the content.
+For PDF pages this picks the render DPI per page (never above the resolution
+of an embedded scan) and renders only the content rectangle.  For uploaded
+images the file is decoded once, JPEGs at reduced size where possible.
+Pages where nothing text-like is found are returned unmodified, at the
+default resolution.
+"""
+import io
+import math
+from contextlib import nullcontext
+from typing import ContextManager, NamedTuple, Optional, Tuple
+
+import fitz
+import numpy as np
+from PIL import Image, ImageOps
+
+import settings
+
+LOW_DPI = 72                # analysis pass for PDF pages; 1 px == 1 pt
+ANALYSIS_SIDE = 1200        # long side of the analysis copy of an image
+MAX_SKEW_DEG = 5.0
+SKEW_STEP_DEG = 0.25
+MIN_SKEW_DEG = 0.3          # below this, rotating costs more than it helps
+MARGIN = 0.02               # crop margin, as a fraction of the page size
+_SKEW_SAMPLE = 20000        # ink pixels used for the skew search
+
+
+class Layout(NamedTuple):
+    skew: float                             # degrees, counter-clockwise correction
+    line_px: Optional[float]                # median text line height, in analysed pixels
+    box: Optional[Tuple[int, int, int, int]]   # x0, y0, x1, y1 of the content, analysed pixels
+
+
+# ──────────────────────────  Page analysis  ──────────────────────────
+def _ink(gray: np.ndarray) -> np.ndarray:
+    """Dark-on-light mask via Otsu's threshold; empty for flat images."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(float)
+    if gray.size == 0 or hist.max() == gray.size:
+        return np.zeros(gray.shape, dtype=bool)
+    levels = np.arange(256)
+    w0 = np.cumsum(hist)
+    w1 = gray.size - w0
+    m0 = np.cumsum(hist * levels)
+    mean0 = m0 / np.maximum(w0, 1)
+    mean1 = (m0[-1] - m0) / np.maximum(w1, 1)
+    threshold = int(np.argmax(w0 * w1 * (mean0 - mean1) ** 2))
+    return gray <= threshold
+
+
+def _skew(ink: np.ndarray) -> float:
+    """Angle (degrees) that makes text lines horizontal: sharpest row histogram wins."""
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > _SKEW_SAMPLE:
+        pick = np.random.default_rng(0).choice(len(ys), _SKEW_SAMPLE, replace=False)
+        ys, xs = ys[pick], xs[pick]
+    ys = ys.astype(float)
+    xs = xs - xs.mean()
+    height = ink.shape[0]
+    best, best_score = 0.0, -1.0
+    for angle in np.arange(-MAX_SKEW_DEG, MAX_SKEW_DEG + 1e-9, SKEW_STEP_DEG):
+        rows = np.round(ys - xs * math.tan(math.radians(angle))).astype(np.intp)
+        hist = np.bincount(np.clip(rows, 0, height - 1), minlength=height)
+        score = float(hist @ hist)
+        if score > best_score:
+            best, best_score = float(angle), score
+    return best
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """(start, end) of every run of True in a 1-D mask."""
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    return np.stack([np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)], axis=1)
+
+
+def analyse(gray: np.ndarray, skew: bool = True) -> Layout:
+    ink = _ink(gray)
+    angle = _skew(ink) if skew else 0.0
+    if abs(angle) >= MIN_SKEW_DEG:
+        # measure lines on the straightened copy
+        gray = np.asarray(Image.fromarray(gray).rotate(angle, fillcolor=255, resample=Image.BILINEAR))
+        ink = _ink(gray)
+
+    rows, cols = ink.sum(axis=1), ink.sum(axis=0)
+    if not rows.any():
+        return Layout(angle, None, None)
+    # relative thresholds keep scanner speckle from counting as content
+    text_rows = rows > 0.05 * rows.max()
+    text_cols = cols > 0.05 * cols.max()
+    lines = _runs(text_rows)
+    heights = lines[:, 1] - lines[:, 0]
+    heights = heights[heights >= 2]             # drop table rules and specks
+    if not len(heights):
+        return Layout(angle, None, None)
+    x_runs = _runs(text_cols)
+    box = (int(x_runs[0, 0]), int(lines[0, 0]), int(x_runs[-1, 1]), int(lines[-1, 1]))
+    return Layout(angle, float(np.median(heights)), box)
+
+
+def _pad(box, width: int, height: int, scale: float = 1.0) -> Tuple[int, int, int, int]:
+    mx, my = MARGIN * width, MARGIN * height
+    x0, y0, x1, y1 = box
+    return (
+        max(0, int((x0 - mx) * scale)), max(0, int((y0 - my) * scale)),
+        min(int(width * scale), math.ceil((x1 + mx) * scale)),
+        min(int(height * scale), math.ceil((y1 + my) * scale)),
+    )
+
+
+# ──────────────────────────  PDF pages  ──────────────────────────
+def _native_dpi(page: "fitz.Page") -> Optional[float]:
+    """Resolution of the scan when the page is a single embedded image."""
+    images = page.get_images()
+    if len(images) != 1:
+        return None
+    xref, width = images[0][0], images[0][2]
+    rects = page.get_image_rects(xref)
+    if not rects or rects[0].width <= 0:
+        return None
+    return width / (rects[0].width / 72)
+
+
+def choose_dpi(line_px_at_low: float, native: Optional[float] = None) -> int:
+    """DPI that renders lines measured at ``LOW_DPI`` at the target height."""
+    dpi = LOW_DPI * settings.OCR_TARGET_LINE_PX / line_px_at_low
+    if native:
+        dpi = min(dpi, native)
+    dpi = min(max(dpi, settings.OCR_MIN_DPI), settings.OCR_MAX_DPI)
+    return int(round(dpi / 10) * 10)
+
+
+def render_gray(page: "fitz.Page", dpi: int, clip=None) -> np.ndarray:
+    """Rasterise a page (or ``clip`` of it) straight to a greyscale pixel array (no PNG round-trip)."""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+    # copy() so the array owns its memory and the pixmap can be freed now
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width).copy()
+
+
+def page_pixels(page: "fitz.Page", default_dpi: int,
+                lock: ContextManager = nullcontext()) -> np.ndarray:
+    """
+    Grayscale raster of a PDF page, prepared for OCR (see module docstring).
+    ``lock`` is held around each MuPDF call only, not the analysis between
+    them, so other pages of the document can render meanwhile.
+    """
+    with lock:
+        low = render_gray(page, LOW_DPI)
+    layout = analyse(low)
+    if layout.line_px is None:
+        with lock:
+            return render_gray(page, default_dpi)
+    with lock:
+        native = _native_dpi(page)
+    dpi = choose_dpi(layout.line_px, native)
+
+    if abs(layout.skew) < MIN_SKEW_DEG:
+        # at 72 dpi pixels are points, and both the box and ``clip`` are in the
+        # displayed (rotated) page space: the box is the clip rectangle as is
+        x0, y0, x1, y1 = _pad(layout.box, low.shape[1], low.shape[0])
+        with lock:
+            return render_gray(page, dpi, clip=fitz.Rect(x0, y0, x1, y1))
+
+    with lock:
+        pixels = render_gray(page, dpi)
+    return _crop(_straighten(pixels, layout.skew), layout.box, low.shape, dpi / LOW_DPI)
+
+
+def _straighten(pixels: np.ndarray, angle: float) -> np.ndarray:
+    return np.asarray(Image.fromarray(pixels).rotate(angle, fillcolor=255, resample=Image.BILINEAR))
+
+
+def _crop(pixels: np.ndarray, box, analysed_shape, scale: float) -> np.ndarray:
+    x0, y0, x1, y1 = _pad(box, analysed_shape[1], analysed_shape[0], scale)
+    return np.ascontiguousarray(pixels[y0:y1, x0:x1])
+
+
+# ──────────────────────────  Uploaded images  ──────────────────────────
+def _open(raw) -> Image.Image:
+    return Image.open(raw if isinstance(raw, str) else io.BytesIO(raw))
+
+
+def decode(raw) -> np.ndarray:
+    """
+    Decode an upload once, to grayscale, upright (EXIF orientation applied)
+    and no larger than ``OCR_MAX_IMAGE_SIDE``.  JPEGs are decoded at reduced
+    size directly.
+    """
+    with _open(raw) as img:
+        limit = settings.OCR_MAX_IMAGE_SIDE
+        if max(img.size) > limit:
+            # JPEG: DCT scaling by a power of two to no less than the requested
+            # size, so asking for half the limit lands between half and all of it
+            img.draft("L", (limit // 2, limit // 2))
+        img = ImageOps.exif_transpose(img).convert("L")
+        if max(img.size) > limit:
+            img.thumbnail((limit, limit), Image.BOX)
+        return np.asarray(img)
+
+
+def _shrink(gray: np.ndarray, side: int) -> Tuple[np.ndarray, int]:
+    """Block-average copy with its long side near ``side``; returns it and the factor."""
+    factor = max(1, max(gray.shape) // side)
+    if factor == 1:
+        return gray, 1
+    return np.asarray(Image.fromarray(gray).reduce(factor)), factor
+
+
+def image_pixels(raw) -> np.ndarray:
+    """Grayscale image prepared for OCR (see module docstring)."""
+    pixels = decode(raw)
+    small, factor = _shrink(pixels, ANALYSIS_SIDE)
+    layout = analyse(small)
+    if layout.line_px is None:
+        return pixels
+
+    # shrink text taller than the target; enlarge only text too small to
+    # read, since upsampling adds pixels but no detail
+    line_px = layout.line_px * factor
+    if line_px > settings.OCR_TARGET_LINE_PX:
+        scale = max(settings.OCR_TARGET_LINE_PX / line_px, 0.1)
+    elif line_px < settings.OCR_MIN_LINE_PX:
+        scale = min(settings.OCR_MIN_LINE_PX / line_px, 2.0)
+    else:
+        scale = 1.0
+    if abs(scale - 1) < 0.1:
+        scale = 1.0
+
+    # rotate and crop at whichever of the two sizes is smaller
+    if scale < 1:
+        pixels = _resize(pixels, scale)
+    if abs(layout.skew) >= MIN_SKEW_DEG:
+        pixels = _straighten(pixels, layout.skew)
+    pixels = _crop(pixels, layout.box, small.shape, factor * min(scale, 1.0))
+    if scale > 1:
+        pixels = _resize(pixels, scale)
+    return pixels
+
+
+def _resize(pixels: np.ndarray, scale: float) -> np.ndarray:
+    size = (max(1, round(pixels.shape[1] * scale)), max(1, round(pixels.shape[0] * scale)))
+    resample = Image.BOX if scale < 1 else Image.BICUBIC
+    return np.asarray(Image.fromarray(pixels).resize(size, resample))
@@ -0,0 +1,148 @@
+# backend/reclassify.py
+"""
+Vectorised Low/Normal/High classification for bulk re-evaluation.
+
+When a reference range changes, stored results are re-flagged here in one
+NumPy pass over columnar ``(test, value)`` arrays instead of re-running
+``analyze_medical_report`` per report.  The comparisons mirror the per-report
+path exactly (``value < min`` → Low, else ``value > max`` → High), and the
+per-report ``flags`` / ``body_analysis`` are rebuilt with grouped reductions
+in the same shape and order ``analyze_medical_report`` produces.  A test
+with no range is Normal on both paths; callers that must not touch such
+rows (``HistoryStore.reclassify``) only pass the tests they have ranges for.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rules import BodyPart, map_test_to_body_part, registry
+
+Range = Tuple[float, float]
+
+_PARTS = list(BodyPart)
+_FULL_BODY = _PARTS.index(BodyPart.FULL_BODY)
+# indexed by kind: 0 normal, 1 low, 2 high
+_STATUS = np.array(["Normal", "Low", "High"], dtype=object)
+_STATUS_TYPE = np.array(["normal", "low", "high"], dtype=object)
+_FLAG = np.array(["", "Below normal range", "Above normal range"], dtype=object)
+
+
+class Classified(NamedTuple):
+    tests: np.ndarray
+    values: np.ndarray
+    status: np.ndarray          # "Normal" | "Low" | "High"
+    status_type: np.ndarray     # "normal" | "low" | "high"
+    flag: np.ndarray            # "" | "Below normal range" | "Above normal range"
+    body_part: np.ndarray       # index into list(BodyPart)
+    abnormal: np.ndarray        # bool
+
+
+def _factorize(labels: np.ndarray) -> Tuple[List[Any], np.ndarray]:
+    """Distinct labels in first-seen order and each row's code (hash based, no sort)."""
+    index: Dict[Any, int] = {}
+    codes = np.fromiter((index.setdefault(label, len(index)) for label in labels),
+                        dtype=np.intp, count=len(labels))
+    return list(index), codes
+
+
+def classify(tests: Sequence[str], values: Sequence[float],
+             ranges: Optional[Mapping[str, Range]] = None) -> Classified:
+    """Classify every ``(test, value)`` pair at once against ``ranges`` (default: the rules')."""
+    ranges = registry.rules.ranges if ranges is None else ranges
+    tests = np.asarray(tests, dtype=object)
+    values = np.asarray(values, dtype=float)
+
+    # one lookup per distinct test name, then broadcast back to the rows
+    names, codes = _factorize(tests)
+    bounds = np.array([ranges.get(name, (np.nan, np.nan)) for name in names], dtype=float).reshape(-1, 2)
+    parts = np.array([_PARTS.index(map_test_to_body_part(name)) for name in names], dtype=np.intp)
+    low = values < bounds[codes, 0]
+    high = ~low & (values > bounds[codes, 1])
+    kind = low.astype(np.int8) + 2 * high.astype(np.int8)
+
+    return Classified(
+        tests=tests,
+        values=values,
+        status=_STATUS[kind],
+        status_type=_STATUS_TYPE[kind],
+        flag=_FLAG[kind],
+        body_part=parts[codes],
+        abnormal=kind > 0,
+    )
+
+
+def body_analysis(report_ids: Sequence[Any], classified: Classified) -> Dict[Any, Dict[str, Any]]:
+    """
+    ``body_analysis`` per report, as ``analyze_medical_report`` builds it.
+    Rows of one report must be in their ``test_results`` order; affected
+    parts are listed by first flagged row and ties for most affected go to
+    the part flagged first.
+    """
+    reports, r = _factorize(np.asarray(report_ids, dtype=object))
+    abnormal = classified.abnormal
+    rows = np.flatnonzero(abnormal)
+    shape = (len(reports), len(_PARTS))
+
+    counts = np.zeros(shape, dtype=np.int64)
+    np.add.at(counts, (r[rows], classified.body_part[rows]), 1)
+    first = np.full(shape, np.inf)
+    np.minimum.at(first, (r[rows], classified.body_part[rows]), rows)
+
+    affected = counts > 0
+    # more abnormal tests wins; the fractional part breaks ties by first flag
+    score = np.where(affected, counts - first / (len(abnormal) + 1), -np.inf)
+    most = score.argmax(axis=1)
+    any_affected = affected.any(axis=1)
+    order = np.argsort(first, axis=1, kind="stable")
+
+    result = {}
+    for i, report in enumerate(reports):
+        parts = [_PARTS[p].value for p in order[i, :affected[i].sum()]]
+        result[report] = {
+            "affected_parts": parts,
+            "most_affected_part": _PARTS[most[i]].value if any_affected[i] else "None",
+            "full_body_affected": bool(affected[i, _FULL_BODY]),
+        }
+    return result
+
+
+def flags(report_ids: Sequence[Any], classified: Classified) -> Dict[Any, List[Dict[str, str]]]:
+    """``flags`` per report for the abnormal rows only."""
+    report_ids = np.asarray(report_ids, dtype=object)
+    # first-seen order; np.unique would sort, and fails on mixed int / str ids
+    out: Dict[Any, List[Dict[str, str]]] = {report: [] for report in dict.fromkeys(report_ids)}
+    for i in np.flatnonzero(classified.abnormal):
+        out[report_ids[i]].append({
+            "test": classified.tests[i],
+            "message": classified.flag[i],
+            "severity": "warning",
+            "body_part": _PARTS[classified.body_part[i]].value,
+        })
+    return out
+
+
+def reclassify(tests: Sequence[str], values: Sequence[float],
+               report_ids: Optional[Sequence[Any]] = None,
+               ranges: Optional[Mapping[str, Range]] = None) -> Dict[str, Any]:
+    """
+    Columnar re-evaluation: per-row ``status`` / ``status_type`` / ``flag``,
+    plus per-report ``flags`` and ``body_analysis`` when ``report_ids`` is
+    given.
+    """
+    classified = classify(tests, values, ranges)
+    out: Dict[str, Any] = {
+        "status": classified.status.tolist(),
+        "status_type": classified.status_type.tolist(),
+        "flag": classified.flag.tolist(),
+    }
+    if report_ids is not None:
+        out["flags"] = flags(report_ids, classified)
+        out["body_analysis"] = body_analysis(report_ids, classified)
+    return out
+
+
+def ranges_from(pairs: Iterable[Tuple[str, Sequence[float]]]) -> Dict[str, Range]:
+    """The rules' reference ranges overridden by ``(test, (min, max))`` pairs."""
+    ranges = dict(registry.rules.ranges)
+    ranges.update((test, (float(lo), float(hi))) for test, (lo, hi) in pairs)
+    return ranges
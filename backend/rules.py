@@ -0,0 +1,137 @@
+# backend/rules.py
+"""
+Data-driven rule registry: test → body part, test → reference range,
+(test, status) → insight, the tests each panel is expected to report (for
+stopping OCR early), and the other names labs print for a test.
+
+Rules live in ``rules.json`` (``HEALTHSCAN_RULES_PATH``) and are compiled
+once into plain dicts for O(1) lookups.  The file's mtime is checked at most
+every ``RULES_RELOAD_SECONDS``; an edited file is picked up without a
+restart, and a broken edit is reported and ignored, keeping the last good
+rules.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from enum import Enum
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
+
+import settings
+
+
+class BodyPart(Enum):
+    HEAD = "Head"
+    NECK = "Neck"
+    CHEST = "Chest"
+    ABDOMEN = "Abdomen"
+    PELVIS = "Pelvis"
+    ARM = "Arm"
+    LEG = "Leg"
+    FULL_BODY = "Full Body"
+    BLOOD_SYSTEM = "Blood System"
+    IMMUNE_SYSTEM = "Immune System"
+
+
+class Insight(NamedTuple):
+    message: str
+    severity: str
+
+
+class Rules(NamedTuple):
+    body_parts: Dict[str, BodyPart]
+    default_body_part: BodyPart
+    ranges: Dict[str, Tuple[float, float]]      # test → (min normal, max normal)
+    insights: Dict[Tuple[str, str], Insight]    # (test, status) → insight
+    panels: Dict[str, FrozenSet[str]]           # panel → tests it is expected to report
+    names: Dict[str, str]                       # folded test name or alias → test
+    version: str = ""                           # content hash; keys cached analyses
+
+    def body_part(self, test_name: str) -> BodyPart:
+        return self.body_parts.get(test_name, self.default_body_part)
+
+    def canonical(self, name: str) -> Optional[str]:
+        """The test a printed name stands for ("Haemoglobin" → "Hemoglobin"), if known."""
+        return self.names.get(_fold(name))
+
+
+_NOT_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def _fold(name: str) -> str:
+    return _NOT_ALNUM.sub("", name.lower())
+
+
+def _range(test: str, bounds) -> Tuple[float, float]:
+    low, high = bounds
+    if not all(isinstance(b, (int, float)) for b in bounds) or low > high:
+        raise ValueError(f"range for {test} must be [min, max], got {bounds}")
+    return low, high     # as written, so 40 prints as "40" in normal_range
+
+
+def compile_rules(config: dict) -> Rules:
+    """Validate a rules document and build its lookup tables."""
+    insights = {}
+    for rule in config.get("insights", []):
+        insight = Insight(rule["message"], rule["severity"])
+        for test in rule["tests"]:
+            insights[(test, rule["status"])] = insight
+    tests = [*config.get("body_parts", {}), *config.get("ranges", {})]
+    tests += [test for panel in config.get("panels", {}).values() for test in panel]
+    names = {_fold(test): test for test in tests}
+    names.update((_fold(alias), test) for alias, test in config.get("aliases", {}).items())
+    return Rules(
+        body_parts={test: BodyPart(part) for test, part in config.get("body_parts", {}).items()},
+        default_body_part=BodyPart(config.get("default_body_part", BodyPart.FULL_BODY.value)),
+        ranges={test: _range(test, bounds) for test, bounds in config.get("ranges", {}).items()},
+        insights=insights,
+        panels={name: frozenset(tests) for name, tests in config.get("panels", {}).items()},
+        names=names,
+        version=hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12],
+    )
+
+
+class RuleRegistry:
+    def __init__(self, path: str, reload_seconds: float):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime
+        self._checked = time.monotonic()
+        with open(path, encoding="utf-8") as f:
+            self._rules = compile_rules(json.load(f))
+
+    @property
+    def rules(self) -> Rules:
+        """Current rules; cheap enough to call per lookup."""
+        if time.monotonic() - self._checked >= self.reload_seconds:
+            self._maybe_reload()
+        return self._rules
+
+    def _maybe_reload(self) -> None:
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime == self._mtime:
+                    return
+                with open(self.path, encoding="utf-8") as f:
+                    rules = compile_rules(json.load(f))
+            except Exception:
+                print(f"❌  Could not reload rules from {self.path}; keeping previous rules:")
+                traceback.print_exc()
+                return
+            self._mtime = mtime
+            self._rules = rules   # single reference swap; readers never see a half-built table
+            print(f"🔄  Reloaded rules from {self.path}")
+
+
+registry = RuleRegistry(settings.RULES_PATH, settings.RULES_RELOAD_SECONDS)
+
+
+def map_test_to_body_part(test_name: str) -> BodyPart:
+    """Map medical tests to body parts/systems"""
+    return registry.rules.body_part(test_name)
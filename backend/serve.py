@@ -0,0 +1,154 @@
+# backend/serve.py
+"""
+Production entry point: one listening socket, N pre-forked uvicorn workers
+sharing one copy of the OCR model.
+
+Run from ``backend/``:
+
+    python serve.py                    # HEALTHSCAN_SERVER_WORKERS workers on :8000
+    python serve.py --workers 4 --port 8080
+
+The launcher loads the OCR backends once, then forks the workers.  The
+model's memory is shared copy-on-write, so a worker costs its own heap
+rather than another copy of the weights; ``gc.freeze()`` before the fork
+keeps the collector from writing to (and so copying) the pages that hold
+them.  Each worker OCRs in its own process (``HEALTHSCAN_OCR_WORKERS`` is
+forced to 0; a spawned pool would load the model again per process).
+
+Each worker gets an even share of the cores (``threads_per_worker``) and
+keeps within it however many uploads it admits: at most ``pages`` pages are
+OCR'd at once in the worker (``OCR_CONCURRENT_PAGES``), each with ``torch``
+threads, where pages × torch ≤ its share.  Workers are replaced after
+``SERVER_MAX_REQUESTS`` requests (plus jitter) to bound memory growth, and
+when they die.  Each worker keeps its own ``/metrics``.
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from typing import Tuple
+
+# Must precede ``import settings``: see the module docstring.
+os.environ["HEALTHSCAN_OCR_WORKERS"] = "0"
+
+import settings                                                   # noqa: E402
+from ocr_pool import pin_threads                                  # noqa: E402
+
+
+def threads_per_worker(workers: int) -> int:
+    return settings.SERVER_THREADS_PER_WORKER or max(1, (os.cpu_count() or 1) // workers)
+
+
+def thread_budget(threads: int) -> Tuple[int, int]:
+    """(pages OCR'd at once, torch threads per page) for a worker with ``threads`` cores."""
+    torch_threads = max(1, threads // settings.OCR_PAGE_THREADS)
+    return max(1, threads // torch_threads), torch_threads
+
+
+def preload(threads: int) -> None:
+    """Load the OCR backends in the launcher, before any worker exists."""
+    pin_threads(threads)
+    try:
+        import torch
+        torch.set_num_interop_threads(1)    # once per process, before any parallel work
+    except ImportError:
+        pass
+    import ocr
+    # Load only: running a page here would start torch's OpenMP pool, which
+    # does not survive a fork.
+    print(f"🧠  OCR model {ocr.warm_up()} in launcher pid={os.getpid()}")
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, threads: int, max_requests: int) -> None:
+    pages, torch_threads = thread_budget(threads)
+    settings.OCR_CONCURRENT_PAGES = pages
+    pin_threads(torch_threads)
+
+    import uvicorn
+    from main import app
+
+    config = uvicorn.Config(app, limit_max_requests=max_requests or None, log_level="info")
+    print(f"👷  Server worker pid={os.getpid()} ready"
+          + (f", recycled after {max_requests} requests" if max_requests else ""))
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _fork_worker(sock: socket.socket, threads: int) -> int:
+    limit = settings.SERVER_MAX_REQUESTS
+    if limit:
+        limit += random.randint(0, settings.SERVER_MAX_REQUESTS_JITTER)
+    pid = os.fork()
+    if pid:
+        return pid
+    # child: uvicorn installs its own handlers for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    code = 0
+    try:
+        run_worker(sock, threads, limit)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        os._exit(code)
+
+
+def supervise(workers: int, host: str, port: int) -> None:
+    threads = threads_per_worker(workers)
+    pages, torch_threads = thread_budget(threads)
+    sock = _listen(host, port)
+    preload(torch_threads)
+    gc.freeze()
+    print(f"🚀  Serving on http://{host}:{port} with {workers} worker(s), {threads} thread(s) each"
+          f" ({pages} page(s) OCR'd at once × {torch_threads} torch thread(s))")
+
+    children = set()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while True:
+        while not stopping and len(children) < workers:
+            children.add(_fork_worker(sock, threads))
+        if not children:
+            break
+        pid, status = os.wait()
+        children.discard(pid)
+        code = os.waitstatus_to_exitcode(status)
+        if stopping:
+            continue
+        if code == 0:
+            print(f"♻️  Server worker pid={pid} recycled, starting a new one")
+        else:
+            print(f"⚠️  Server worker pid={pid} exited with {code}, restarting")
+            time.sleep(1)       # do not spin on a worker that dies at start-up
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the HealthScan API with pre-forked workers")
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    args = parser.parse_args()
+    supervise(args.workers, args.host, args.port)
@@ -0,0 +1,123 @@
+# backend/settings.py
+"""
+Runtime knobs, read once from the environment.  Every value has a default
+that works for a single local instance.
+"""
+import os
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+# ─────────────────────────  Result cache  ─────────────────────────
+CACHE_MAX_ENTRIES = _int("HEALTHSCAN_CACHE_MAX_ENTRIES", 256)
+CACHE_MAX_BYTES = _int("HEALTHSCAN_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_TTL_SECONDS = _float("HEALTHSCAN_CACHE_TTL_SECONDS", 24 * 3600)
+CACHE_DB_PATH = os.environ.get("HEALTHSCAN_CACHE_DB", "")   # empty → memory only
+CACHE_DB_MAX_BYTES = _int("HEALTHSCAN_CACHE_DB_MAX_BYTES", 1024 * 1024 * 1024)
+
+# ─────────────────────────  OCR process pool  ─────────────────────────
+# 0 workers runs extraction in the API process's threadpool instead.
+OCR_WORKERS = _int("HEALTHSCAN_OCR_WORKERS", os.cpu_count() or 1)
+# Jobs allowed to wait for a free worker before uploads get a 503.
+OCR_QUEUE_DEPTH = _int("HEALTHSCAN_OCR_QUEUE_DEPTH", 2 * (os.cpu_count() or 1))
+OCR_RETRY_AFTER_SECONDS = _int("HEALTHSCAN_OCR_RETRY_AFTER_SECONDS", 5)
+# Load the OCR model when a worker starts rather than on its first scan.
+OCR_PRELOAD = _int("HEALTHSCAN_OCR_PRELOAD", 1) == 1
+# Warm the pool in the background at API startup; /health/ready waits on it.
+OCR_WARMUP_ON_STARTUP = _int("HEALTHSCAN_OCR_WARMUP", 1) == 1
+# Pages of one scanned PDF OCR'd concurrently inside a worker.
+OCR_PAGE_THREADS = _int("HEALTHSCAN_OCR_PAGE_THREADS", min(4, os.cpu_count() or 1))
+# Pages OCR'd at once per process, across all uploads (0 → no limit beyond
+# the above).  serve.py sizes it to each worker's share of the cores.
+OCR_CONCURRENT_PAGES = _int("HEALTHSCAN_OCR_CONCURRENT_PAGES", 0)
+
+# ─────────────────────────  OCR backends  ─────────────────────────
+# Engines tried per page, fastest first (easyocr, tesseract, stub); a page
+# goes on to the next one only when its reading is poor (see ocr_backends).
+OCR_BACKENDS = [
+    name.strip() for name in os.environ.get("HEALTHSCAN_OCR_BACKENDS", "tesseract,easyocr").split(",")
+    if name.strip()
+]
+OCR_ESCALATE_CONFIDENCE = _float("HEALTHSCAN_OCR_ESCALATE_CONFIDENCE", 0.80)   # mean word confidence, 0–1
+OCR_ESCALATE_MIN_TESTS = _int("HEALTHSCAN_OCR_ESCALATE_MIN_TESTS", 1)           # lab tests found on the page
+# Too few tests escalates only below this confidence too: cover, disclaimer
+# and signature pages read cleanly and hold no tests.
+OCR_ESCALATE_TESTS_BELOW_CONFIDENCE = _float("HEALTHSCAN_OCR_ESCALATE_TESTS_BELOW_CONFIDENCE", 0.90)
+
+# ─────────────────────────  OCR preprocessing  ─────────────────────────
+# Measure each page at low resolution first and OCR it deskewed, cropped and
+# scaled so text lines are OCR_TARGET_LINE_PX tall (0 → fixed-DPI rendering).
+OCR_PREPROCESS = _int("HEALTHSCAN_OCR_PREPROCESS", 1) == 1
+OCR_TARGET_LINE_PX = _int("HEALTHSCAN_OCR_TARGET_LINE_PX", 24)
+OCR_MIN_LINE_PX = _int("HEALTHSCAN_OCR_MIN_LINE_PX", 14)
+OCR_MIN_DPI = _int("HEALTHSCAN_OCR_MIN_DPI", 120)
+OCR_MAX_DPI = _int("HEALTHSCAN_OCR_MAX_DPI", 300)
+# Uploaded images are decoded no larger than this on their long side.
+OCR_MAX_IMAGE_SIDE = _int("HEALTHSCAN_OCR_MAX_IMAGE_SIDE", 4000)
+
+# ─────────────────────────  PDF triage  ─────────────────────────
+# Pages with fewer non-whitespace selectable characters than this are OCR'd.
+PDF_MIN_PAGE_CHARS = _int("HEALTHSCAN_PDF_MIN_PAGE_CHARS", 40)
+
+# ─────────────────────────  Observability  ─────────────────────────
+# Fraction of extractions that print a one-line summary (no report text).
+# 0 → never, 1 → every file.
+LOG_SAMPLE_RATE = _float("HEALTHSCAN_LOG_SAMPLE_RATE", 0.0)
+
+# ─────────────────────────  Early termination  ─────────────────────────
+# Stop OCR-ing a PDF once every panel detected so far has all its expected
+# tests (see "panels" in rules.json); later scanned pages are skipped.
+OCR_EARLY_STOP = _int("HEALTHSCAN_OCR_EARLY_STOP", 1) == 1
+# Most pages of one PDF that are OCR'd (0 → no limit).
+OCR_PAGE_BUDGET = _int("HEALTHSCAN_OCR_PAGE_BUDGET", 0)
+
+# ─────────────────────────  Batch uploads  ─────────────────────────
+# Reports of one batch processed at the same time (the OCR pool still bounds OCR).
+BATCH_CONCURRENCY = _int("HEALTHSCAN_BATCH_CONCURRENCY", max(1, OCR_WORKERS))
+BATCH_MAX_FILES = _int("HEALTHSCAN_BATCH_MAX_FILES", 1000)
+# How many times a batch item waits out a saturated OCR pool before failing.
+BATCH_SATURATED_RETRIES = _int("HEALTHSCAN_BATCH_SATURATED_RETRIES", 10)
+
+# ─────────────────────────  Job queue  ─────────────────────────
+JOBS_DB_PATH = os.environ.get("HEALTHSCAN_JOBS_DB", "jobs.db")
+JOB_WORKERS = _int("HEALTHSCAN_JOB_WORKERS", max(1, (os.cpu_count() or 1) // 2))
+# A running job whose lease is not renewed in time is assumed crashed and requeued.
+JOB_LEASE_SECONDS = _float("HEALTHSCAN_JOB_LEASE_SECONDS", 120)
+JOB_MAX_ATTEMPTS = _int("HEALTHSCAN_JOB_MAX_ATTEMPTS", 3)
+JOB_POLL_SECONDS = _float("HEALTHSCAN_JOB_POLL_SECONDS", 1.0)
+
+# ─────────────────────────  Upload ingestion  ─────────────────────────
+MAX_UPLOAD_BYTES = _int("HEALTHSCAN_MAX_UPLOAD_BYTES", 50 * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = _int("HEALTHSCAN_UPLOAD_CHUNK_BYTES", 1024 * 1024)
+UPLOAD_TMP_DIR = os.environ.get("HEALTHSCAN_UPLOAD_TMP_DIR") or None   # None → system temp
+
+# ─────────────────────────  Patient history  ─────────────────────────
+HISTORY_DB_PATH = os.environ.get("HEALTHSCAN_HISTORY_DB", "history.db")   # empty → not persisted
+# Reports uploaded without a patient_id are recorded under a hash of the
+# printed patient name only when this is on; it merges patients who share a
+# name, so by default such reports are analysed but not kept in history.
+HISTORY_KEY_BY_NAME = _int("HEALTHSCAN_HISTORY_KEY_BY_NAME", 0) == 1
+
+# ─────────────────────────  Rule registry  ─────────────────────────
+RULES_PATH = os.environ.get(
+    "HEALTHSCAN_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+)
+# How often (seconds) the rules file's mtime is checked for hot reload.
+RULES_RELOAD_SECONDS = _float("HEALTHSCAN_RULES_RELOAD_SECONDS", 5)
+
+# ─────────────────────────  Server launcher (serve.py)  ─────────────────────────
+SERVER_HOST = os.environ.get("HEALTHSCAN_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = _int("HEALTHSCAN_SERVER_PORT", 8000)
+SERVER_WORKERS = _int("HEALTHSCAN_SERVER_WORKERS", max(1, (os.cpu_count() or 1) // 2))
+# torch / BLAS threads per worker (0 → the cores divided evenly between workers).
+SERVER_THREADS_PER_WORKER = _int("HEALTHSCAN_SERVER_THREADS_PER_WORKER", 0)
+# A worker is replaced after this many requests, plus up to the jitter so
+# workers do not all restart together (0 → never).
+SERVER_MAX_REQUESTS = _int("HEALTHSCAN_SERVER_MAX_REQUESTS", 1000)
+SERVER_MAX_REQUESTS_JITTER = _int("HEALTHSCAN_SERVER_MAX_REQUESTS_JITTER", 100)
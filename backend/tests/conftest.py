@@ -0,0 +1,22 @@
+# backend/tests/conftest.py
+"""
+Tests import the app modules from ``backend/`` directly, as the server does.
+Settings are read at import, so the environment is pinned here first: jobs
+run in-process, nothing is warmed up, and every database lives in a temp
+directory.
+"""
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="healthscan-tests-")
+
+os.environ.update({
+    "HEALTHSCAN_OCR_WORKERS": "0",
+    "HEALTHSCAN_OCR_WARMUP": "0",
+    "HEALTHSCAN_OCR_BACKENDS": "stub",
+    "HEALTHSCAN_CACHE_DB": "",
+    "HEALTHSCAN_HISTORY_DB": os.path.join(_TMP, "history.db"),
+    "HEALTHSCAN_JOBS_DB": os.path.join(_TMP, "jobs.db"),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,161 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from cache import MemoryTier, ResultCache, SingleFlight, SQLiteTier
+
+
+def test_sqlite_replace_counts_the_new_size_only(tmp_path):
+    tier = SQLiteTier(str(tmp_path / "cache.db"), max_bytes=1000, ttl=60)
+    for _ in range(5):
+        tier.put("a", "x" * 300)
+    assert tier._bytes == tier._total() == 300
+    tier.put("b", "y" * 300)
+    # nothing evicted: 600 bytes stored, not the 1800 the replaces used to add up to
+    assert (tier.get("a"), tier._bytes) == ("x" * 300, 600)
+
+
+def test_single_flight_waiter_takes_over_from_cancelled_leader():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(asyncio.current_task().get_name())
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("k", work), name="leader")
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flight.do("k", work), name=f"waiter{i}") for i in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(run()) == ["done"] * 3
+    assert calls == ["leader", "waiter0"]
+
+
+def test_single_flight_cancelled_waiter_leaves_the_leader_alone():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader
+
+    assert asyncio.run(run()) == "done"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache, "time", SimpleNamespace(time=clock, monotonic=clock))
+    return clock
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    tier = MemoryTier(max_entries=2, max_bytes=1000, ttl=60)
+    tier.put("a", {"v": "a"}, 10)
+    tier.put("b", {"v": "b"}, 10)
+    assert tier.get("a") == {"v": "a"}          # a is now the most recent
+    tier.put("c", {"v": "c"}, 10)
+    assert (tier.get("a"), tier.get("b"), tier.get("c")) == ({"v": "a"}, None, {"v": "c"})
+
+
+def test_memory_tier_byte_cap_and_ttl(clock):
+    tier = MemoryTier(max_entries=10, max_bytes=100, ttl=60)
+    tier.put("huge", {}, 101)                    # bigger than the whole tier: not kept
+    tier.put("a", {}, 60)
+    tier.put("b", {}, 60)                        # 120 bytes: a goes
+    assert (tier.get("huge"), tier.get("a"), len(tier)) == (None, None, 1)
+    clock.now += 61
+    assert tier.get("b") is None and len(tier) == 0
+
+
+def _keys(tier: SQLiteTier):
+    # straight from the table: get() would refresh the access times under test
+    return [key for key, in tier._conn.execute("SELECT key FROM results ORDER BY key")]
+
+
+def test_sqlite_tier_evicts_expired_then_least_recently_used(tmp_path, clock):
+    tier = SQLiteTier(str(tmp_path / "cache.db"), max_bytes=1000, ttl=60)
+    tier.put("old", "o" * 300)
+    clock.now += 50
+    tier.put("a", "a" * 300)
+    clock.now += 1
+    tier.put("b", "b" * 300)
+    clock.now += 1
+    assert tier.get("a") == "a" * 300            # a is now more recent than b
+    clock.now += 9                               # "old" has expired
+    tier.put("c", "c" * 300)                     # over the cap: expired rows go first
+    assert _keys(tier) == ["a", "b", "c"]
+    clock.now += 1
+    tier.put("d", "d" * 300)                     # still over: least recently used (b) goes
+    assert _keys(tier) == ["a", "c", "d"]
+    assert tier._bytes == tier._total() == 900
+
+
+def test_result_cache_promotes_disk_hits_and_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(MemoryTier(10, 10_000, 60), SQLiteTier(path, 10_000, 60)).put("k", {"tests": [1, 2]})
+
+    restarted = ResultCache(MemoryTier(10, 10_000, 60), SQLiteTier(path, 10_000, 60))
+    assert restarted.memory.get("k") is None
+    assert restarted.get("k") == {"tests": [1, 2]}
+    assert restarted.memory.get("k") == {"tests": [1, 2]}
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"n": len(calls)}
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        again = await flight.do("k", work)       # nothing in flight any more: runs again
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert results == [{"n": 1}] * 5 and again == {"n": 2}
+
+
+def test_single_flight_failure_reaches_every_caller_and_is_not_kept():
+    flight = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("bad scan")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(run())] == ["bad scan"] * 3
+    assert len(calls) == 1 and flight._inflight == {}
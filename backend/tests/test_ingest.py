@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from starlette.requests import Request
+
+import settings
+from ingest import receive_form, UploadTooLarge
+
+BOUNDARY = b"healthscan-test-boundary"
+
+
+def _request(chunks, pulled):
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "query_string": b"",
+        # chunked: no Content-Length to refuse the request up front
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY)],
+    }
+    chunks = iter(chunks)
+
+    async def receive():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        pulled.append(len(chunk))
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    return Request(scope, receive)
+
+
+def _part(filename: str, payload: bytes) -> bytes:
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="' + filename.encode() + b'"\r\n\r\n'
+        + payload + b"\r\n"
+    )
+
+
+def test_receive_form_spools_once_and_deletes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    payload = os.urandom(300_000)
+    body = (
+        b"--" + BOUNDARY + b'\r\nContent-Disposition: form-data; name="patient_id"\r\n\r\nP-7\r\n'
+        + _part("Report.PDF", payload) + b"--" + BOUNDARY + b"--\r\n"
+    )
+
+    async def run():
+        request = _request([body[i:i + 4096] for i in range(0, len(body), 4096)], [])
+        async with receive_form(request) as form:
+            filename, spooled = form.single_file()
+            assert (filename, form.fields) == ("Report.PDF", {"patient_id": "P-7"})
+            assert spooled.path.endswith(".pdf") and os.path.dirname(spooled.path) == str(tmp_path)
+            assert (spooled.size, spooled.sha256) == (len(payload), hashlib.sha256(payload).hexdigest())
+            with open(spooled.path, "rb") as f:
+                assert f.read() == payload
+        assert os.listdir(tmp_path) == []
+
+    asyncio.run(run())
+
+
+def test_receive_form_stops_reading_past_the_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    pulled = []
+    chunk = b"x" * 64 * 1024
+    chunks = [_part("big.pdf", b"")[:-2]] + [chunk] * 1000   # a 64 MB part, never finished
+
+    async def run():
+        with pytest.raises(UploadTooLarge):
+            async with receive_form(_request(chunks, pulled), max_bytes=1024 * 1024):
+                pass
+        assert os.listdir(tmp_path) == []
+
+    asyncio.run(run())
+    # the cap plus the multipart allowance, not the whole body
+    assert sum(pulled) <= 1024 * 1024 + 2 * len(chunk) + 1024
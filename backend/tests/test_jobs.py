@@ -0,0 +1,123 @@
+import hashlib
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import jobs
+import settings
+from jobs import JobStore
+
+
+def _store(tmp_path, **kwargs) -> JobStore:
+    options = {"lease_seconds": 60, "max_attempts": 3, **kwargs}
+    return JobStore(str(tmp_path / "jobs.db"), **options)
+
+
+def test_patient_id_travels_with_the_job(tmp_path):
+    store = _store(tmp_path)
+    store.enqueue("a.pdf", b"%PDF", patient_id="P-7")
+    store.enqueue("b.pdf", b"%PDF")
+    claimed = [store.claim("w1"), store.claim("w1")]
+    assert [(job["filename"], job["patient_id"]) for job in claimed] == [("a.pdf", "P-7"), ("b.pdf", None)]
+
+
+def test_queue_without_patient_column_is_migrated(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "jobs.db"))
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, filename TEXT NOT NULL, payload BLOB,"
+        " priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+        " max_attempts INTEGER NOT NULL, lease_until REAL, worker TEXT, result TEXT, error TEXT,"
+        " created REAL NOT NULL, updated REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs (id, filename, payload, status, max_attempts, created, updated)"
+                 " VALUES ('old', 'old.pdf', x'00', 'queued', 3, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    store = _store(tmp_path)
+    store.enqueue("new.pdf", b"%PDF", patient_id="P-7")
+    assert [(job["job_id"], job["patient_id"]) for job in (store.claim("w1"),)] == [("old", None)]
+    assert store.claim("w1")["patient_id"] == "P-7"
+
+
+def test_payload_streams_out_to_a_hashed_temp_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 4096)
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    payload = os.urandom(50_000)
+    upload = tmp_path / "upload.pdf"
+    upload.write_bytes(payload)
+    store = _store(tmp_path)
+    store.enqueue("Report.PDF", str(upload))
+    upload.unlink()
+
+    job = store.claim("w1")
+    with store.spooled_payload(job) as (path, sha256):
+        assert path.endswith(".pdf")
+        assert sha256 == hashlib.sha256(payload).hexdigest()
+        with open(path, "rb") as f:
+            assert f.read() == payload
+    assert not os.path.exists(path)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(jobs, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_claims_highest_priority_then_oldest(tmp_path, clock):
+    store = _store(tmp_path)
+    ids = {}
+    for name, priority in [("low", 0), ("high-old", 5), ("high-new", 5), ("mid", 1)]:
+        ids[store.enqueue(name, b"%PDF", priority)] = name
+        clock[0] += 1
+    claimed = [store.claim("w1")["filename"] for _ in ids]
+    assert claimed == ["high-old", "high-new", "mid", "low"]
+    assert store.claim("w1") is None
+
+
+def test_expired_lease_is_retried_by_another_worker(tmp_path, clock):
+    store = _store(tmp_path, lease_seconds=60)
+    job_id = store.enqueue("a.pdf", b"%PDF")
+    assert store.claim("w1")["attempt"] == 1
+
+    clock[0] += 30
+    store.renew(job_id, "w1")                  # lease now runs to +90
+    clock[0] += 59
+    assert store.claim("w2") is None           # still held by w1
+
+    clock[0] += 2                              # w1 went quiet: its lease lapsed
+    retried = store.claim("w2")
+    assert (retried["job_id"], retried["attempt"]) == (job_id, 2)
+
+    store.finish(job_id, "w1", {"tests": "stale"})   # the crashed worker's late answer is ignored
+    assert store.get(job_id)["status"] == "running"
+    store.finish(job_id, "w2", {"tests": []})
+    assert store.get(job_id) | {"created": None, "updated": None} == {
+        "job_id": job_id, "filename": "a.pdf", "priority": 0, "status": "done", "attempts": 2,
+        "result": {"tests": []}, "error": None, "created": None, "updated": None,
+    }
+
+
+def test_job_failed_once_every_attempt_crashed(tmp_path, clock):
+    store = _store(tmp_path, lease_seconds=60, max_attempts=2)
+    job_id = store.enqueue("a.pdf", b"%PDF")
+    for worker in ("w1", "w2"):
+        assert store.claim(worker)["job_id"] == job_id
+        clock[0] += 61
+    assert store.claim("w3") is None
+    job = store.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 2, "worker crashed on every attempt")
+    assert store._conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone() == (None,)
+
+
+def test_error_result_fails_the_job(tmp_path):
+    store = _store(tmp_path)
+    job_id = store.enqueue("a.pdf", b"%PDF")
+    store.claim("w1")
+    store.finish(job_id, "w1", {"error": "No text could be extracted"})
+    job = store.get(job_id)
+    assert (job["status"], job["error"], store.claim("w1")) == ("failed", "No text could be extracted", None)
@@ -0,0 +1,49 @@
+import fitz
+
+import layout
+from analysis import analyze_medical_report
+from parser import Row
+
+
+def _page(lines, columns=(50, 220, 300, 380)):
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, cells in enumerate(lines):
+        for x, text in zip(columns, cells):
+            if text:
+                page.insert_text((x, 100 + 18 * i), text, fontsize=10)
+    return doc, page
+
+
+def test_header_table_rows_use_canonical_names_and_rules_ranges():
+    doc, page = _page([
+        ("Investigation", "Result", "Unit", "Reference Range"),
+        ("Haemoglobin", "11.2", "g/dL", "13.0 - 17.0"),
+        ("Total RBC Count", "4.9", "mill/cumm", "4.5 - 5.5"),
+        ("Platelet", "90", "10^3/uL", ""),        # no printed range: the rules' one
+        ("Hct", "38", "%", "40 - 50"),
+    ])
+    with doc:
+        rows = layout.page_rows(page)
+    assert rows == [
+        Row("Hemoglobin", 11.2, "g/dL", 13.0, 17.0, "low"),
+        Row("RBC Count", 4.9, "mill/cumm", 4.5, 5.5, "normal"),
+        Row("Platelet Count", 90.0, "10^3/uL", 150, 410, "low"),
+        Row("PCV", 38.0, "%", 40.0, 50.0, "low"),
+    ]
+
+    analysis = analyze_medical_report("", rows=rows)
+    assert [t["test"] for t in analysis["test_results"]] == ["Hemoglobin", "RBC Count", "Platelet Count", "PCV"]
+    assert analysis["body_analysis"]["affected_parts"] == ["Blood System"]
+
+
+def test_rows_without_header_are_read_by_cell_order():
+    doc, page = _page([
+        ("Patient Name : A Patient", "", "", ""),
+        ("Haemoglobin", "15.1", "g/dL", "13.0 - 17.0"),
+        ("Hematocrit", "52", "%", "40 - 50"),
+        ("Page 1 of 1", "", "", ""),
+    ])
+    with doc:
+        rows = layout.page_rows(page)
+    assert [(row.name, row.value, row.status) for row in rows] == [("Hemoglobin", 15.1, "normal"), ("PCV", 52.0, "high")]
@@ -0,0 +1,39 @@
+from parser import Row, iter_lab_rows, rows_from_text
+
+
+def test_triplets_are_consumed_whole():
+    # each value line belongs to the name above it; it never starts the next triplet
+    text = "Complete Blood Count\nHaemoglobin\n11.2\ng/dL\nWBC\n7.1\n10^3/uL\nPlatelets\n250\n10^3/uL\n"
+    assert list(iter_lab_rows(text)) == [
+        Row("Hemoglobin", 11.2, "g/dL", 13.0, 17.0, "low"),
+        Row("WBC", 7.1, "10^3/uL", 4.0, 11.0, "normal"),
+        Row("Platelets", 250.0, "10^3/uL", 150, 450, "normal"),
+    ]
+
+
+def test_stray_number_does_not_shift_the_triplets():
+    text = "Hb\n11.2\ng/dL\n12.5\nMCV\n80\nfL\n"
+    assert [(row.name, row.value, row.unit) for row in iter_lab_rows(text)] == [
+        ("Hemoglobin", 11.2, "g/dL"), ("MCV", 80.0, "fL"),
+    ]
+
+
+def test_table_rows_replace_triplet_guesses():
+    text = "Hemoglobin\n11.2\ng/dL\nWBC  7.1  10^3/uL\nPlatelets\n250\n10^3/uL\n"
+    assert [row.name for row in iter_lab_rows(text)] == ["WBC"]
+
+
+def test_streamed_chunks_parse_like_the_whole_text():
+    text = "Name: A\nHaemoglobin  11.2  g/dL\nWBC  12.5  10^3/uL\nPlatelet Count  250  10^3/uL\n"
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert list(iter_lab_rows(chunks)) == list(iter_lab_rows(text))
+    assert [(row.name, row.status) for row in iter_lab_rows(text)] == [
+        ("Hemoglobin", "low"), ("WBC", "high"), ("Platelet Count", "normal"),
+    ]
+
+
+def test_rows_from_text_prefers_cbc_patterns_then_table_rows():
+    rows = rows_from_text("Hemoglobin 11.2 g/dL 13.0 - 17.0\nMCV 80 fl\n")
+    assert [(row.name, row.value, row.status) for row in rows] == [("Hemoglobin", 11.2, "low"), ("MCV", 80.0, "low")]
+    # no CBC pattern matches: the table parser's rows
+    assert [(row.name, row.value, row.unit) for row in rows_from_text("HbA1c  6.1  %\n")] == [("HbA1c", 6.1, "%")]
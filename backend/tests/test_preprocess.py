@@ -0,0 +1,25 @@
+import fitz
+import numpy as np
+import pytest
+
+import preprocess
+
+
+def _rotated_page(rotation: int):
+    doc = fitz.open()
+    page = doc.new_page()
+    lines = "\n".join(f"Hemoglobin {i}  14.2  g/dL  13.0 - 17.0" for i in range(12))
+    page.insert_text((200, 300), lines, fontsize=11)
+    page.set_rotation(rotation)
+    return doc, page
+
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+def test_crop_keeps_all_content_of_rotated_page(rotation, monkeypatch):
+    monkeypatch.setattr(preprocess, "choose_dpi", lambda *args, **kwargs: 150)
+    doc, page = _rotated_page(rotation)
+    with doc:
+        cropped = preprocess.page_pixels(page, 150)
+        full = preprocess.render_gray(page, 150)
+    assert cropped.size < full.size / 4
+    assert np.count_nonzero(cropped < 128) == np.count_nonzero(full < 128)
@@ -0,0 +1,47 @@
+import pytest
+
+import rules
+from analysis import analyze_medical_report
+from benchmarks.corpus import report_text
+from reclassify import reclassify
+
+# these keep no reference range for the parity run
+UNRANGED = ("PCV", "MCV", "Platelet Count")
+
+
+@pytest.fixture
+def partial_ranges(monkeypatch):
+    current = rules.registry.rules
+    ranges = {test: bounds for test, bounds in current.ranges.items() if test not in UNRANGED}
+    monkeypatch.setattr(rules.registry, "_rules", current._replace(ranges=ranges))
+    monkeypatch.setattr(rules.registry, "reload_seconds", float("inf"))
+
+
+def test_vectorised_path_matches_per_report_analysis(partial_ranges):
+    report_ids, tests, values, expected = [], [], [], {}
+    for seed in range(40):
+        report_id = seed if seed % 2 else f"r{seed}"       # mixed int / str ids
+        analysis = analyze_medical_report(report_text(1, 12, seed=seed))
+        expected[report_id] = analysis
+        for row in analysis["test_results"]:
+            report_ids.append(report_id)
+            tests.append(row["test"])
+            values.append(row["value"])
+    assert set(tests) & set(UNRANGED)
+
+    out = reclassify(tests, values, report_ids)
+
+    statuses = [row["status"] for a in expected.values() for row in a["test_results"]]
+    flags = [row["flag"] for a in expected.values() for row in a["test_results"]]
+    assert out["status"] == statuses
+    assert out["flag"] == flags
+    assert list(out["flags"]) == list(expected)
+    for report_id, analysis in expected.items():
+        assert out["flags"][report_id] == analysis["flags"]
+        assert out["body_analysis"][report_id] == analysis["body_analysis"]
+
+
+def test_test_without_range_is_normal_on_both_paths(partial_ranges):
+    analysis = analyze_medical_report("PCV 99 %")
+    assert analysis["test_results"][0]["status"] == "Normal"
+    assert reclassify(["PCV"], [99.0])["status"] == ["Normal"]
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from history import compute_trends
+
+DAY = 86400.0
+T0 = 1_700_000_000.0
+
+
+def _rows(test, points, unit="g/dL"):
+    return [(test, T0 + day * DAY, value, unit, status) for day, value, status in points]
+
+
+def test_slope_delta_and_streaks_per_test():
+    hb = [(0, 14.0, "Normal"), (10, 12.5, "Low"), (20, 12.0, "Low"), (40, 13.5, "Normal"), (45, 12.9, "Low")]
+    wbc = [(0, 7.0, "Normal"), (3, 12.0, "High"), (9, 13.0, "High"), (30, 15.0, "High")]
+    trends = compute_trends(_rows("Hemoglobin", hb) + _rows("WBC", wbc, "10^3/uL"))
+
+    for test, points in (("Hemoglobin", hb), ("WBC", wbc)):
+        days, values, _ = zip(*points)
+        stats = trends[test]["stats"]
+        assert stats["slope_per_day"] == pytest.approx(np.polyfit(days, values, 1)[0], abs=1e-6)
+        assert stats["last_delta"] == pytest.approx(values[-1] - values[-2])
+        assert (stats["count"], stats["first"], stats["last"]) == (len(values), values[0], values[-1])
+        assert (stats["min"], stats["max"]) == (min(values), max(values))
+        assert stats["mean"] == pytest.approx(np.mean(values), abs=1e-4)
+        assert [p["value"] for p in trends[test]["series"]] == list(values)
+
+    hb_stats, wbc_stats = trends["Hemoglobin"]["stats"], trends["WBC"]["stats"]
+    assert (hb_stats["out_of_range_streak"], hb_stats["longest_out_of_range_streak"]) == (1, 2)
+    assert (wbc_stats["out_of_range_streak"], wbc_stats["longest_out_of_range_streak"]) == (3, 3)
+    assert trends["WBC"]["unit"] == "10^3/uL"
+
+
+def test_streak_does_not_carry_over_between_tests():
+    # MCV ends abnormal; the next test starts a fresh count
+    rows = _rows("MCV", [(0, 70, "Low"), (5, 72, "Low")], "fl") + _rows("PCV", [(0, 38, "Low"), (5, 45, "Normal")], "%")
+    trends = compute_trends(rows)
+    assert trends["MCV"]["stats"]["out_of_range_streak"] == 2
+    assert (trends["PCV"]["stats"]["out_of_range_streak"], trends["PCV"]["stats"]["longest_out_of_range_streak"]) == (0, 1)
+
+
+def test_single_reading_and_same_day_readings_have_no_slope():
+    trends = compute_trends(
+        _rows("Hemoglobin", [(0, 11.0, "Low")]) + _rows("WBC", [(2, 6.0, "Normal"), (2, 6.4, "Normal")])
+    )
+    assert trends["Hemoglobin"]["stats"] == {
+        "count": 1, "first": 11.0, "last": 11.0, "min": 11.0, "max": 11.0, "mean": 11.0,
+        "slope_per_day": None, "last_delta": None,
+        "out_of_range_streak": 1, "longest_out_of_range_streak": 1,
+    }
+    assert trends["WBC"]["stats"]["slope_per_day"] is None
+    assert trends["WBC"]["stats"]["last_delta"] == pytest.approx(0.4)
+    assert compute_trends([]) == {}
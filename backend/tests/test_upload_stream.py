@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import pytest
+
+import settings
+from benchmarks.corpus import text_pdf
+
+
+def _multipart(filename: str, payload: bytes):
+    boundary = b"healthscan-test-boundary"
+    body = (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="' + filename.encode() + b'"\r\n'
+        b"Content-Type: application/octet-stream\r\n\r\n"
+        + payload + b"\r\n--" + boundary + b"--\r\n"
+    )
+    return boundary, body
+
+
+async def _post(app, path: str, filename: str, payload: bytes, send):
+    boundary, body = _multipart(filename, payload)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [
+            (b"content-type", b"multipart/form-data; boundary=" + boundary),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.Event().wait()
+
+    await app(scope, receive, send)
+
+
+@pytest.mark.parametrize("gone_after", [0, 2])
+def test_stream_spool_removed_when_client_disconnects(gone_after, tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(settings, "UPLOAD_TMP_DIR", str(tmp_path))
+    sent = []
+
+    async def send(message):
+        # The server's send fails once the client is gone: before the response
+        # starts (0) or after the first event has been written (2).
+        if len(sent) >= gone_after:
+            raise OSError("client disconnected")
+        sent.append(message)
+
+    payload = text_pdf(2, 12, 7)
+
+    async def run():
+        with pytest.raises(Exception):
+            await _post(main.app, "/upload/stream", "report.pdf", payload, send)
+        # Checked before the loop shuts down and finalizes abandoned generators.
+        assert os.listdir(tmp_path) == []
+
+    asyncio.run(run())
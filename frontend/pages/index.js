@@ -14,6 +14,7 @@ export default function Home() {
   const [patientInfo, setPatientInfo] = useState({});
   const [bodyAnalysis, setBodyAnalysis] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [progress, setProgress] = useState('');
   const [hasUploaded, setHasUploaded] = useState(false);
 
   /* ─────────── ROUTE-PROTECTION ─────────── */
@@ -101,13 +102,14 @@ export default function Home() {
   const handleUpload = async () => {
     if (!file) return;
     setLoading(true);
+    setProgress('');
     setHasUploaded(true);
 
     const fd = new FormData();
     fd.append('file', file);
 
     try {
-      const res = await fetch('http://127.0.0.1:8000/upload', { 
+      const res = await fetch('http://127.0.0.1:8000/upload/stream', { 
         method: 'POST', 
         body: fd 
       });
@@ -116,19 +118,42 @@ export default function Home() {
         throw new Error(`HTTP error! status: ${res.status}`);
       }
       
-      const data = await res.json();
-      
-      if (data.error) {
-        throw new Error(data.error);
+      // Server-Sent Events: blocks of "event: ..." / "data: ..." lines
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let found = 0;
+      let done = false;
+      while (!done) {
+        const chunk = await reader.read();
+        done = chunk.done;
+        buffer += decoder.decode(chunk.value || new Uint8Array(), { stream: !done });
+        const blocks = buffer.split('\n\n');
+        buffer = blocks.pop();
+        
+        for (const block of blocks) {
+          const event = (block.match(/^event: (.*)$/m) || [])[1];
+          const data = JSON.parse((block.match(/^data: (.*)$/m) || [])[1] || '{}');
+          
+          if (event === 'page') {
+            setProgress(`Page ${data.page} of ${data.pages} · ${found} tests found`);
+          } else if (event === 'tests') {
+            found += data.test_results.length;
+            setProgress(`Page ${data.page} · ${found} tests found`);
+          } else if (event === 'error') {
+            throw new Error(data.error);
+          } else if (event === 'result') {
+            processAnalysisData(data);
+          }
+        }
       }
       
-      processAnalysisData(data);
-      
     } catch (err) {
       console.error('Upload error:', err);
       alert(`Upload failed: ${err.message}`);
     } finally {
       setLoading(false);
+      setProgress('');
     }
   };
 
@@ -225,7 +250,7 @@ export default function Home() {
                           <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4" />
                           <path className="opacity-75" fill="currentColor" d="M4 12a8 8 0 018-8v8z" />
                         </svg>
-                        Analyzing...
+                        {progress || 'Analyzing...'}
                       </>
                     ) : (
                       <>